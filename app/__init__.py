@@ -1,13 +1,30 @@
 from flask import Flask, render_template
 from config import config
-from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bootstrap import Bootstrap
 from flask_mail import Mail
 
-db = SQLAlchemy()
+from app.query_guard import QueryGuard
+from app.last_seen import LastSeenBuffer
+from app.mail_queue import MailQueue
+from app.caching import RoleCache, IdentityCache, FragmentCache
+from app.metrics import Metrics
+from app.hashing import PasswordHasher
+from app.replica import RoutingSQLAlchemy, ReplicaRouter
+from app import sqlite_tuning
+
+db = RoutingSQLAlchemy()
 bootstrap = Bootstrap()
 mail = Mail()
+query_guard = QueryGuard()
+last_seen = LastSeenBuffer()
+mail_queue = MailQueue()
+role_cache = RoleCache()
+identity_cache = IdentityCache()
+fragment_cache = FragmentCache()
+metrics = Metrics()
+password_hasher = PasswordHasher()
+replica = ReplicaRouter()
 
 login_manager = LoginManager()
 login_manager.session_protection = 'strong'
@@ -23,10 +40,23 @@ def create_app(config_name):
     bootstrap.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    query_guard.init_app(app)
+    last_seen.init_app(app)
+    mail_queue.init_app(app)
+    role_cache.init_app(app)
+    identity_cache.init_app(app)
+    fragment_cache.init_app(app)
+    metrics.init_app(app)
+    password_hasher.init_app(app)
+    replica.init_app(app)
+    sqlite_tuning.install(app, db)
 
     from app.auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint, url_prefix='/auth')
 
     from app.main import main as main_blueprint
     app.register_blueprint(main_blueprint)
+
+    from app.api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
     return app
\ No newline at end of file
@@ -0,0 +1,19 @@
+from flask import jsonify
+
+from . import api
+
+
+def error_response(status, message):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+@api.errorhandler(404)
+def not_found(e):
+    return error_response(404, 'not found')
+
+
+@api.errorhandler(400)
+def bad_request(e):
+    return error_response(400, e.description)
@@ -0,0 +1,141 @@
+from flask import current_app, jsonify, request, abort, url_for
+
+from . import api
+from .. import db
+from ..models import Post, User
+from ..pagination import keyset_paginate, InvalidCursor
+
+posts = Post.__table__
+users = User.__table__
+
+POST_FIELDS = {
+    'id': posts.c.id,
+    'body': posts.c.body,
+    'body_html': posts.c.body_html,
+    'time': posts.c.time,
+    'author_id': posts.c.author_id,
+    'author': users.c.username,
+    'disabled': posts.c.disabled,
+}
+
+HIDDEN_POST_FIELDS = ('body', 'body_html')
+
+USER_FIELDS = {
+    'id': users.c.id,
+    'username': users.c.username,
+    'name': users.c.name,
+    'location': users.c.location,
+    'about_me': users.c.about_me,
+    'member_since': users.c.member_since,
+    'last_seen': users.c.last_seen,
+    'avatar_hash': users.c.avatar_hash,
+    'posts_count': users.c.posts_count,
+    'followers_count': users.c.followers_count,
+    'followed_count': users.c.followed_count,
+}
+
+
+def _fields(available):
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f'unknown fields: {", ".join(unknown)}')
+    return names
+
+
+def _value(value):
+    return value.isoformat() + 'Z' if hasattr(value, 'isoformat') else value
+
+
+def _serialize(row, names):
+    return {name: _value(getattr(row, name)) for name in names}
+
+
+def _post_columns(names):
+    return [POST_FIELDS[name].label(name) for name in names] + \
+        [posts.c.disabled.label('_disabled')]
+
+
+def _serialize_post(row, names):
+    data = _serialize(row, names)
+    if row._disabled:
+        data.update({name: None for name in HIDDEN_POST_FIELDS if name in data})
+    return data
+
+
+def _row_key(row):
+    return row._cursor_time, row._cursor_id
+
+
+def _post_page(endpoint, author=None, **values):
+    names = _fields(POST_FIELDS)
+    columns = _post_columns(names)
+    columns += [posts.c.time.label('_cursor_time'), posts.c.id.label('_cursor_id')]
+    query = db.session.query(*columns)
+    if 'author' in names:
+        query = query.select_from(posts).outerjoin(users, users.c.id == posts.c.author_id)
+    if author is not None:
+        query = query.filter(posts.c.author_id == author)
+    per_page = min(request.args.get('limit', current_app.config['SOCIAL_BLOG_POSTS_PER_PAGE'],
+                                    type=int),
+                   current_app.config['SOCIAL_BLOG_API_MAX_PER_PAGE'])
+    if per_page < 1:
+        abort(400, 'limit must be positive')
+    try:
+        page = keyset_paginate(query, posts.c.time, posts.c.id,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               per_page=per_page, key=_row_key)
+    except InvalidCursor:
+        abort(400, 'invalid cursor')
+    links = {'fields': request.args.get('fields'), 'limit': request.args.get('limit')}
+    links = {key: value for key, value in links.items() if value}
+    return jsonify({
+        'posts': [_serialize_post(row, names) for row in page.items],
+        'next': url_for(endpoint, after=page.next_cursor, _external=True, **values, **links)
+        if page.has_next else None,
+        'prev': url_for(endpoint, before=page.prev_cursor, _external=True, **values, **links)
+        if page.has_prev else None,
+    })
+
+
+def _user_id(username):
+    user_id = db.session.query(users.c.id).filter(users.c.username == username).scalar()
+    if user_id is None:
+        abort(404)
+    return user_id
+
+
+@api.route('/posts/')
+def get_posts():
+    return _post_page('api.get_posts')
+
+
+@api.route('/posts/<int:id>')
+def get_post(id):
+    names = _fields(POST_FIELDS)
+    query = db.session.query(*_post_columns(names))
+    if 'author' in names:
+        query = query.select_from(posts).outerjoin(users, users.c.id == posts.c.author_id)
+    row = query.filter(posts.c.id == id).first()
+    if row is None:
+        abort(404)
+    return jsonify(_serialize_post(row, names))
+
+
+@api.route('/users/<username>')
+def get_user(username):
+    names = _fields(USER_FIELDS)
+    row = db.session.query(*[USER_FIELDS[name].label(name) for name in names]) \
+        .filter(users.c.username == username).first()
+    if row is None:
+        abort(404)
+    return jsonify(_serialize(row, names))
+
+
+@api.route('/users/<username>/posts/')
+def get_user_posts(username):
+    return _post_page('api.get_user_posts', author=_user_id(username), username=username)
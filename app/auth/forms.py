@@ -8,7 +8,8 @@ from email_validator import validate_email
 from flask_wtf import FlaskForm
 from wtforms import ValidationError
 
-from app.models import User, Role
+from app import role_cache
+from app.models import User
 
 
 class LoginForm(FlaskForm):
@@ -74,6 +75,11 @@ class EditProfileForm(FlaskForm):
     submit = SubmitField('Submit')
 
 
+def role_choices():
+    return sorted(((id, name) for id, (name, _) in role_cache.roles().items()),
+                  key=lambda choice: choice[1])
+
+
 class EditProfileAdminForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Length(1, 64), Email()])
     username = StringField('Username',
@@ -90,7 +96,7 @@ class EditProfileAdminForm(FlaskForm):
 
     def __init__(self, user, *args, **kwargs):
         super(EditProfileAdminForm, self).__init__(*args, **kwargs)
-        self.role.choices = [(role.id, role.name) for role in Role.query.order_by(Role.name).all()]
+        self.role.choices = role_choices()
         self.user = user
 
     def validate_email(self, field):
@@ -102,3 +108,7 @@ class EditProfileAdminForm(FlaskForm):
         if field.data != self.user.username \
                 and User.query.filter_by(username=field.data).first():
             raise ValidationError('Username already exist')
+
+
+class ActionForm(FlaskForm):
+    """Only a CSRF token, for buttons that change state."""
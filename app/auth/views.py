@@ -1,15 +1,24 @@
-from flask import render_template, request, redirect, url_for, flash, abort
+from itertools import chain
+
+from flask import (
+    render_template, request, redirect, url_for, flash, abort,
+    current_app, Response, stream_with_context,
+)
 from flask_login import login_user, logout_user, login_required, current_user
+from flask_wtf.csrf import generate_csrf
 
-from app.decorators import admin_required
+from app.decorators import admin_required, permission_required
 from app import auth
 from app.auth.forms import (
     LoginForm, RegisterForm, ChangePasswordForm,
     ResetPasswordForm, ChangeEmailForm, EditProfileForm,
-    EditProfileAdminForm,
+    EditProfileAdminForm, ActionForm,
 )
-from app.models import User, Role, Post
-from .. import db
+from app.models import User, Role, Post, ArchivedPost, Permissions, Notification
+from .. import db, identity_cache
+from ..replica import use_primary
+from ..http_cache import not_modified
+from ..streaming import stream_template
 from ..email import send_email
 
 
@@ -44,6 +53,11 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user is not None and user.verify_password(form.password.data):
+            if user.password_needs_rehash():
+                user.password = form.password.data
+                db.session.add(user)
+                db.session.commit()
+                identity_cache.invalidate(user.id)
             login_user(user, form.remember_me.data)
             return redirect(request.args.get('next') or url_for('main.index'))
         flash('Invalid credentials')
@@ -67,6 +81,8 @@ def register():
             password=form.password.data,
         )
         db.session.add(user)
+        db.session.flush()
+        Notification.notify_admin(user)
         db.session.commit()
         token = user.generate_confirmation_token()
         send_email(user.email, 'Confirm Your Account',
@@ -79,12 +95,14 @@ def register():
 
 
 @auth.auth.route('/confirm/<token>')
+@use_primary
 @login_required
 def confirm(token):
     if current_user.confirmed:
         return redirect(url_for('main.index'))
     if current_user.confirm(token):
         db.session.commit()
+        identity_cache.invalidate(current_user.id)
         flash('You have confirmed your account!')
     else:
         flash('The confirmation link is invalid or expired')
@@ -94,12 +112,13 @@ def confirm(token):
 @auth.auth.route('/password/change', methods=["POST", "GET"])
 @login_required
 def change_password():
-    form = ChangePasswordForm
+    form = ChangePasswordForm()
     if form.validate_on_submit():
-        if current_user.verify_password(form.password_old):
-            current_user.password = form.password_new
-            db.session.add(current_user)
+        if current_user.verify_password(form.password_old.data):
+            current_user.password = form.password_new.data
+            db.session.add(current_user._get_current_object())
             db.session.commit()
+            identity_cache.invalidate(current_user.id)
             flash('Your password has been updated!')
             return redirect(url_for('main.index'))
         else:
@@ -127,8 +146,68 @@ def user(username):
 
     if user is None:
         abort(404)
-    posts = user.posts.order_by(Post.time.desc()).all()
-    return render_template('user.html', user=user, posts=posts)
+    has_archive = user.has_archived_posts()
+    response = not_modified(user.id, user.profile_version, user.posts_count,
+                            user.followers_count, user.followed_count, user.last_seen,
+                            Post.versions(user.id), has_archive)
+    if response is not None:
+        return response
+    show_archive = has_archive and request.args.get('archived', 0, type=int) == 1
+    queries = [user.posts.order_by(Post.time.desc(), Post.id.desc())]
+    if show_archive:
+        queries.append(user.archived_posts.order_by(ArchivedPost.time.desc(),
+                                                    ArchivedPost.id.desc()))
+    context = {'user': user, 'has_archive': has_archive, 'show_archive': show_archive,
+               'action_form': ActionForm()}
+    if current_user.is_authenticated:
+        # Store the session's CSRF token before a streamed body is sent.
+        generate_csrf()
+    if current_app.config['SOCIAL_BLOG_STREAM_PAGES']:
+        yield_per = current_app.config['SOCIAL_BLOG_STREAM_YIELD_PER']
+        posts = chain.from_iterable(query.yield_per(yield_per) for query in queries)
+        return Response(stream_with_context(stream_template('user.html', posts=posts, **context)))
+    return render_template('user.html', posts=[post for query in queries for post in query],
+                           **context)
+
+
+@auth.auth.route('/follow/<username>', methods=['POST'])
+@use_primary
+@login_required
+@permission_required(Permissions.FOLLOW)
+def follow(username):
+    if not ActionForm().validate_on_submit():
+        abort(400)
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        flash('Invalid user.')
+        return redirect(url_for('main.index'))
+    if current_user.is_following(user):
+        flash('You are already following this user.')
+        return redirect(url_for('.user', username=username))
+    current_user.follow(user)
+    db.session.commit()
+    flash(f'You are now following {username}.')
+    return redirect(url_for('.user', username=username))
+
+
+@auth.auth.route('/unfollow/<username>', methods=['POST'])
+@use_primary
+@login_required
+@permission_required(Permissions.FOLLOW)
+def unfollow(username):
+    if not ActionForm().validate_on_submit():
+        abort(400)
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        flash('Invalid user.')
+        return redirect(url_for('main.index'))
+    if not current_user.is_following(user):
+        flash('You are not following this user.')
+        return redirect(url_for('.user', username=username))
+    current_user.unfollow(user)
+    db.session.commit()
+    flash(f'You are not following {username} anymore.')
+    return redirect(url_for('.user', username=username))
 
 
 @auth.auth.route('/edit-profile', methods=['GET', 'POST'])
@@ -141,6 +220,7 @@ def edit_profile():
         current_user.about_me = form.about_me.data
         db.session.add(current_user._get_current_object())
         db.session.commit()
+        identity_cache.invalidate(current_user.id)
         flash('Your profile has been updated.')
         return redirect(url_for('.user', username=current_user.username))
     form.name.data = current_user.name
@@ -165,6 +245,7 @@ def edit_admin_profile(id):
         user.about_me = form.about_me.data
         db.session.add(user)
         db.session.commit()
+        identity_cache.invalidate(user.id)
         flash('User has updated!')
         return redirect(url_for('.user', username=user.username))
     form.email.data = user.email
@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from markupsafe import Markup
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class RoleCache:
+    """In-process table of role permissions keyed by role id.
+
+    Roles are tiny and almost never change, so the whole table is loaded
+    in one query and kept for ``SOCIAL_BLOG_ROLE_CACHE_TTL`` seconds, or
+    until a committed change to a ``Role`` invalidates it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_ROLE_CACHE_TTL', 300)
+        app.extensions['role_cache'] = {'roles': None, 'expires': 0}
+
+    def _state(self):
+        return current_app.extensions['role_cache']
+
+    def roles(self):
+        from app import db
+        from app.models import Role
+
+        state = self._state()
+        roles = state['roles']
+        if roles is None or state['expires'] < time.monotonic():
+            rows = db.session.query(Role.id, Role.name, Role.permissions).all()
+            roles = {id: (name, permissions or 0) for id, name, permissions in rows}
+            state['roles'] = roles
+            state['expires'] = time.monotonic() + current_app.config['SOCIAL_BLOG_ROLE_CACHE_TTL']
+        return roles
+
+    def permissions(self, role_id):
+        role = self.roles().get(role_id)
+        return role[1] if role is not None else None
+
+    def invalidate(self):
+        self._state()['roles'] = None
+
+
+class IdentityCache:
+    """Short-lived cache of the users returned by ``load_user``.
+
+    Column values are snapshotted for ``SOCIAL_BLOG_IDENTITY_CACHE_TTL``
+    seconds and merged back into the request session without a query.
+    Commits that change a user through the ORM or ``User.adjust_counter``
+    drop its snapshot; other Core writers must call :meth:`invalidate`.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_IDENTITY_CACHE_TTL', 30)
+        app.extensions['identity_cache'] = {'users': {}, 'lock': threading.Lock()}
+
+    def _state(self):
+        return current_app.extensions['identity_cache']
+
+    def load(self, user_id):
+        from app import db
+        from app.models import User
+
+        state = self._state()
+        entry = state['users'].get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            user = User.__mapper__.class_manager.new_instance()
+            for key, value in entry[1].items():
+                set_committed_value(user, key, value)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = User.query.get(user_id)
+        if user is not None:
+            snapshot = {attr.key: getattr(user, attr.key)
+                        for attr in inspect(User).column_attrs}
+            expires = time.monotonic() + current_app.config['SOCIAL_BLOG_IDENTITY_CACHE_TTL']
+            with state['lock']:
+                state['users'][user_id] = (expires, snapshot)
+        return user
+
+    def invalidate(self, user_id):
+        state = self._state()
+        with state['lock']:
+            state['users'].pop(user_id, None)
+
+
+class LRUBackend:
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteBackend:
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS fragments '
+                          '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM fragments WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key, value):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO fragments (key, value) VALUES (?, ?)',
+                              (key, value))
+
+    def delete(self, *keys):
+        with self.lock:
+            self.conn.executemany('DELETE FROM fragments WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM fragments')
+
+
+class FragmentCache:
+    """Cache rendered ``_post.html`` fragments and feeds.
+
+    Entries are keyed by post id and request scheme and stamped with the
+    author's ``profile_version`` and the post's ``version``,
+    ``comments_count`` and ``disabled`` flag, so a profile edit, a post
+    edit, a new comment or a moderator turns them into misses even in
+    processes that did not make the change;
+    edited or deleted posts are also dropped explicitly with
+    :meth:`delete_posts` and the feeds they appear in with
+    :meth:`delete_feeds`. ``SOCIAL_BLOG_FRAGMENT_CACHE`` selects the
+    ``'lru'`` or ``'sqlite'`` backend, or disables caching when ``None``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_FRAGMENT_CACHE', 'lru')
+        app.config.setdefault('SOCIAL_BLOG_FRAGMENT_CACHE_SIZE', 2048)
+        app.config.setdefault('SOCIAL_BLOG_FRAGMENT_CACHE_PATH', None)
+        kind = app.config['SOCIAL_BLOG_FRAGMENT_CACHE']
+        if kind == 'lru':
+            backend = LRUBackend(app.config['SOCIAL_BLOG_FRAGMENT_CACHE_SIZE'])
+        elif kind == 'sqlite':
+            backend = SQLiteBackend(app.config['SOCIAL_BLOG_FRAGMENT_CACHE_PATH'])
+        elif kind is None:
+            backend = None
+        else:
+            raise ValueError(f'Unknown fragment cache backend: {kind}')
+        app.extensions['fragment_cache'] = {'backend': backend, 'hits': 0, 'misses': 0,
+                                            'lock': threading.Lock()}
+        app.add_template_global(self.render_post)
+
+    def _state(self):
+        return current_app.extensions['fragment_cache']
+
+    def render_post(self, post):
+        stamp = (post.author.profile_version if post.author is not None else 0,
+                 post.version, post.comments_count, post.disabled)
+        return self.fetch(f'post:{post.id}:{request.scheme}', stamp,
+                          lambda: self._render(post))
+
+    def fetch(self, key, stamp, render):
+        """Return ``render()``, cached under ``key`` for as long as ``stamp`` holds."""
+        state = self._state()
+        backend = state['backend']
+        if backend is None:
+            return Markup(render())
+        stamp = str(stamp).replace('|', '/')
+        cached = backend.get(key)
+        if cached is not None:
+            cached_stamp, _, html = cached.partition('|')
+            if cached_stamp == stamp:
+                with state['lock']:
+                    state['hits'] += 1
+                return Markup(html)
+        with state['lock']:
+            state['misses'] += 1
+        html = render()
+        backend.set(key, f'{stamp}|{html}')
+        return Markup(html)
+
+    def _render(self, post):
+        return current_app.jinja_env.get_template('_post.html').render(post=post)
+
+    def delete_posts(self, post_ids):
+        if not post_ids:
+            return
+        backend = self._state()['backend']
+        if backend is not None:
+            backend.delete(*[f'post:{id}:{scheme}' for id in post_ids
+                             for scheme in ('http', 'https')],
+                           *[f'entry:{id}' for id in post_ids])
+
+    def delete_feeds(self, author_ids):
+        if not author_ids:
+            return
+        backend = self._state()['backend']
+        if backend is not None:
+            backend.delete('feed:all', *[f'feed:{id}' for id in author_ids])
+
+    def clear(self):
+        backend = self._state()['backend']
+        if backend is not None:
+            backend.clear()
+
+    def stats(self):
+        state = self._state()
+        return {'hits': state['hits'], 'misses': state['misses']}
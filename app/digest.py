@@ -0,0 +1,107 @@
+from collections import deque
+from itertools import groupby
+
+from flask import current_app
+from flask_mail import Message
+
+from app import db, mail_queue
+from app.models import Notification, User
+
+
+def _pending_recipients(notifications, after, high_water, limit):
+    return [row[0] for row in db.session.execute(
+        db.select([notifications.c.recipient_id])
+        .where(notifications.c.recipient_id > after)
+        .where(notifications.c.id <= high_water)
+        .group_by(notifications.c.recipient_id)
+        .order_by(notifications.c.recipient_id)
+        .limit(limit))]
+
+
+def _collect(notifications, recipient_ids, high_water, max_items):
+    """Stream the recipients' pending events in (recipient, id) order and
+    keep only the newest ``max_items`` of each, with the total count."""
+    rows = db.session.execute(
+        db.select([notifications.c.recipient_id, notifications.c.kind,
+                   notifications.c.actor_id, notifications.c.post_id,
+                   notifications.c.comment_id, notifications.c.time])
+        .where(notifications.c.recipient_id.in_(recipient_ids))
+        .where(notifications.c.id <= high_water)
+        .order_by(notifications.c.recipient_id, notifications.c.id))
+    for recipient_id, group in groupby(rows, key=lambda row: row.recipient_id):
+        items, total = deque(maxlen=max_items), 0
+        for row in group:
+            items.append(row)
+            total += 1
+        yield recipient_id, list(items), total
+
+
+def _render(app, templates, user, items, total, users):
+    items = [{'kind': row.kind, 'actor': users.get(row.actor_id, (None, None))[0],
+              'post_id': row.post_id, 'comment_id': row.comment_id, 'time': row.time}
+             for row in reversed(items)]
+    context = {'username': user[0], 'items': items, 'total': total, 'more': total - len(items)}
+    msg = Message(f"{app.config['SOCIAL_BLOG_MAIL_SUBJECT_PREFIX']} "
+                  f"{total} new notification{'s' if total != 1 else ''}",
+                  sender=app.config['SOCIAL_BLOG_MAIL_SENDER'], recipients=[user[1]])
+    msg.body = templates[0].render(context)
+    msg.html = templates[1].render(context)
+    return msg
+
+
+def send_digests(batch_size=100, base_url=None):
+    """Send every recipient with pending notifications one digest email.
+
+    Recipients are taken ``batch_size`` at a time in id order. Their
+    events are streamed and trimmed to the newest
+    ``SOCIAL_BLOG_DIGEST_MAX_ITEMS`` while reading, so memory is bounded
+    by the batch rather than the outbox. Each digest is rendered once from
+    templates loaded once, each batch is sent over a single connection
+    from ``mail_queue.connect``, and the rows it covered are deleted once
+    sent. Events that arrive while the job runs wait for the next one.
+    Returns counts of digests, events and connections.
+    """
+    app = current_app._get_current_object()
+    notifications = Notification.__table__
+    users = User.__table__
+    stats = {'digests': 0, 'events': 0, 'connections': 0}
+    high_water = db.session.scalar(db.select([db.func.max(notifications.c.id)]))
+    if high_water is None:
+        return stats
+    max_items = app.config['SOCIAL_BLOG_DIGEST_MAX_ITEMS']
+    templates = (app.jinja_env.get_template('mail/digest.txt'),
+                 app.jinja_env.get_template('mail/digest.html'))
+    with app.test_request_context(base_url=base_url or app.config['SOCIAL_BLOG_BASE_URL']):
+        last_id = 0
+        while True:
+            recipient_ids = _pending_recipients(notifications, last_id, high_water, batch_size)
+            if not recipient_ids:
+                return stats
+            digests = list(_collect(notifications, recipient_ids, high_water, max_items))
+            user_ids = set(recipient_ids)
+            user_ids.update(row.actor_id for _, items, _ in digests for row in items
+                            if row.actor_id is not None)
+            known = {id: (username, email) for id, username, email in db.session.execute(
+                db.select([users.c.id, users.c.username, users.c.email])
+                .where(users.c.id.in_(user_ids)))}
+            # Recipients without an address have nothing to send; drop their events.
+            done = {recipient_id for recipient_id, _, _ in digests
+                    if not known.get(recipient_id, (None, None))[1]}
+            try:
+                with mail_queue.connect(app) as conn:
+                    stats['connections'] += 1
+                    for recipient_id, items, total in digests:
+                        if recipient_id in done:
+                            continue
+                        conn.send(_render(app, templates, known[recipient_id], items, total,
+                                          known))
+                        done.add(recipient_id)
+                        stats['digests'] += 1
+            finally:
+                if done:
+                    stats['events'] += db.session.execute(
+                        notifications.delete()
+                        .where(notifications.c.recipient_id.in_(sorted(done)))
+                        .where(notifications.c.id <= high_water)).rowcount
+                    db.session.commit()
+            last_id = recipient_ids[-1]
@@ -1,12 +1,6 @@
-from threading import Thread
 from flask import current_app, render_template
 from flask_mail import Message
-from . import mail
-
-
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+from . import mail_queue
 
 
 def send_email(to, subject, template, **kwargs):
@@ -16,6 +10,4 @@ def send_email(to, subject, template, **kwargs):
 
     msg.body = render_template(template + '.txt', **kwargs)
     msg.html = render_template(template + '.html', **kwargs)
-    thr = Thread(target=send_async_email, args=[app, msg])
-    thr.start()
-    return thr
\ No newline at end of file
+    return mail_queue.enqueue(msg)
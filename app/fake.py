@@ -0,0 +1,85 @@
+import hashlib
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from app import db, password_hasher
+from app.models import Role, User, Post, Follow, TimelineEntry
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+         'tempor incididunt ut labore et dolore magna aliqua flask python blog '
+         'sqlite cache index query timeline follow post profile').split()
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _sentence(rng, low=5, high=40):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + '.'
+
+
+def seed(users=100, posts=1000, follows=10, skew=1.1, batch_size=1000,
+         password='password', random_seed=None):
+    """Insert a synthetic dataset with Core executemany batches.
+
+    Post authorship follows a Zipf-like distribution with exponent
+    ``skew`` so a few users write most of the posts, as on a real site.
+    Every user gets ``password``. Counters and timelines are rebuilt in
+    bulk afterwards.
+    """
+    rng = random.Random(random_seed)
+    Role.insert_role()
+    role_id = Role.query.filter_by(default=True).first().id
+    password_hash = password_hasher.hash(password)
+    now = datetime.utcnow()
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+
+    def user_rows():
+        for i in range(first_id, first_id + users):
+            email = f'user{i}@example.com'
+            yield {'email': email, 'username': f'user{i}', 'password_hash': password_hash,
+                   'role_id': role_id, 'confirmed': True, 'name': f'User {i}',
+                   'location': rng.choice(('Minsk', 'Berlin', 'Lisbon', 'Austin')),
+                   'about_me': _sentence(rng), 'member_since': now - timedelta(days=rng.randint(0, 730)),
+                   'last_seen': now, 'avatar_hash': hashlib.md5(email.encode('utf-8')).hexdigest(),
+                   'profile_version': 0}
+
+    for batch in _batches(user_rows(), batch_size):
+        db.session.execute(User.__table__.insert(), batch)
+    db.session.commit()
+
+    user_ids = list(range(first_id, first_id + users))
+    weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, users + 1)))
+
+    def post_rows():
+        for _ in range(posts):
+            body = _sentence(rng)
+            yield {'body': body, 'body_html': Post.render_body(body),
+                   'time': now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                   'author_id': rng.choices(user_ids, cum_weights=weights)[0]}
+
+    for batch in _batches(post_rows(), batch_size):
+        db.session.execute(Post.__table__.insert(), batch)
+        db.session.commit()
+
+    def follow_rows():
+        for follower in user_ids:
+            followed = set(rng.choices(user_ids, cum_weights=weights, k=follows))
+            followed.discard(follower)
+            for followed_id in followed:
+                yield {'follower_id': follower, 'followed_id': followed_id, 'timestamp': now}
+
+    for batch in _batches(follow_rows(), batch_size):
+        db.session.execute(Follow.__table__.insert().prefix_with('OR IGNORE', dialect='sqlite'),
+                           batch)
+    db.session.commit()
+
+    User.reconcile_counters(batch_size)
+    TimelineEntry.rebuild()
+    return user_ids
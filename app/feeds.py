@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from flask import current_app, render_template, request, url_for
+from markupsafe import Markup
+from sqlalchemy.orm import joinedload
+
+from app import fragment_cache
+from app.http_cache import not_modified, content_version
+from app.models import Post
+
+
+def _render_entry(post):
+    stamp = f'{post.author.profile_version}:{post.version}:{post.disabled}:{request.url_root}'
+    return fragment_cache.fetch(f'entry:{post.id}', stamp,
+                                lambda: render_template('_entry.xml', post=post))
+
+
+def _posts(author):
+    size = current_app.config['SOCIAL_BLOG_FEED_SIZE']
+    query = Post.query
+    if author is None:
+        query = query.options(joinedload(Post.author))
+    else:
+        query = query.filter(Post.author_id == author.id)
+    return query.order_by(Post.time.desc(), Post.id.desc()).limit(size).all()
+
+
+def _render(author, posts):
+    if author is None:
+        title = 'Social Blog'
+        alternate = url_for('main.index', _external=True)
+    else:
+        title = f'Social Blog - {author.username}'
+        alternate = url_for('auth.user', username=author.username, _external=True)
+    entries = Markup('').join(_render_entry(post) for post in posts)
+    return render_template('feed.xml', title=title, alternate=alternate, entries=entries,
+                           updated=posts[0].time if posts else datetime.utcnow())
+
+
+def feed_response(author=None):
+    """Serve the Atom feed of ``author``'s posts, or of every post.
+
+    The feed's posts are read with one indexed query and their
+    :func:`~app.http_cache.content_version` answers conditional requests.
+    The XML is cached in the fragment cache under the same version and
+    the author's ``profile_version``, so it is only rebuilt when a post in
+    it or one of their authors changes, and then only the changed entries
+    are rendered.
+    """
+    posts = _posts(author)
+    stamp = (content_version(posts), author.profile_version if author is not None else None)
+    response = not_modified(*stamp, personal=False)
+    if response is not None:
+        return response
+    key = f'feed:{author.id if author is not None else "all"}'
+    xml = fragment_cache.fetch(key, f'{stamp}:{request.url_root}',
+                               lambda: _render(author, posts))
+    return current_app.response_class(xml, mimetype='application/atom+xml')
@@ -0,0 +1,70 @@
+import atexit
+import multiprocessing
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    """Hash and verify passwords off the request thread.
+
+    PBKDF2 runs on a pool of ``SOCIAL_BLOG_HASH_WORKERS`` processes so it
+    neither blocks the worker thread nor holds the GIL; ``0`` hashes inline.
+    New hashes use ``SOCIAL_BLOG_PASSWORD_METHOD`` and
+    ``SOCIAL_BLOG_PASSWORD_SALT_LENGTH``, and :meth:`needs_rehash` reports
+    stored hashes made with older parameters.
+    """
+
+    def __init__(self, app=None):
+        self._apps = weakref.WeakSet()
+        atexit.register(self._shutdown_all)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_PASSWORD_METHOD', 'pbkdf2:sha256:150000')
+        app.config.setdefault('SOCIAL_BLOG_PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('SOCIAL_BLOG_HASH_WORKERS', 0)
+        app.extensions['password_hasher'] = {'executor': None, 'lock': threading.Lock()}
+        self._apps.add(app)
+
+    def _run(self, fn, *args):
+        workers = current_app.config['SOCIAL_BLOG_HASH_WORKERS']
+        if not workers:
+            return fn(*args)
+        state = current_app.extensions['password_hasher']
+        with state['lock']:
+            if state['executor'] is None:
+                state['executor'] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return state['executor'].submit(fn, *args).result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password,
+                         current_app.config['SOCIAL_BLOG_PASSWORD_METHOD'],
+                         current_app.config['SOCIAL_BLOG_PASSWORD_SALT_LENGTH'])
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        if not password_hash or password_hash.count('$') < 2:
+            return True
+        method, salt, _ = password_hash.split('$', 2)
+        return method != current_app.config['SOCIAL_BLOG_PASSWORD_METHOD'] or \
+            len(salt) < current_app.config['SOCIAL_BLOG_PASSWORD_SALT_LENGTH']
+
+    def _shutdown_all(self):
+        for app in list(self._apps):
+            self.shutdown(app)
+
+    def shutdown(self, app):
+        state = app.extensions['password_hasher']
+        if state['executor'] is not None:
+            state['executor'].shutdown()
+            state['executor'] = None
@@ -0,0 +1,60 @@
+import hashlib
+import time
+
+from flask import current_app, request, session, after_this_request
+from flask_login import current_user
+
+
+def content_version(posts):
+    """Digest of what each post contributes to a page: its id, edit
+    ``version``, whether it is hidden, its comment count and its author's
+    ``profile_version``."""
+    parts = tuple((post.id, post.version, post.disabled, post.comments_count,
+                   post.author_id, post.author.profile_version) for post in posts)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def viewer_key():
+    """The parts of the current user that change what a page renders."""
+    if not current_user.is_authenticated:
+        return None
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    return (current_user.id, current_user.role_id, current_user.confirmed,
+            current_user.profile_version, current_user.followed_count,
+            int(time.time() // time_limit))
+
+
+def not_modified(*parts, personal=True):
+    """Answer a conditional GET before the page is rendered.
+
+    ``parts`` are hashed into a weak ETag together with the requested URL
+    and, for ``personal`` pages, :func:`viewer_key`. Returns a 304 response
+    when the request's ``If-None-Match`` still matches, otherwise ``None``;
+    either way the response carries the ETag and ``Cache-Control``/``Vary``
+    headers. No ``Last-Modified`` is sent: edits, moderation and profile
+    changes are not timestamped, so only the ETag can see them. Anonymous
+    and impersonal pages are ``public`` for ``SOCIAL_BLOG_HTTP_MAX_AGE``
+    seconds, signed-in ones ``private`` and revalidated on every request.
+    """
+    if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+        return None
+    viewer = viewer_key() if personal else None
+    etag = hashlib.sha1(repr((request.full_path, viewer) + parts).encode('utf-8')).hexdigest()
+    public = viewer is None
+
+    @after_this_request
+    def set_validators(response):
+        if response.status_code in (200, 304):
+            response.set_etag(etag, weak=True)
+            if public:
+                response.cache_control.public = True
+                response.cache_control.max_age = current_app.config.get('SOCIAL_BLOG_HTTP_MAX_AGE', 0)
+            else:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+        return response
+
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        return current_app.response_class(status=304)
+    return None
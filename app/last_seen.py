@@ -0,0 +1,115 @@
+import atexit
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class _BufferState:
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flusher = None
+
+
+class LastSeenBuffer:
+    """Coalesce ``User.last_seen`` updates in memory.
+
+    A visit is only recorded when the stored value is older than
+    ``SOCIAL_BLOG_LAST_SEEN_GRANULARITY`` seconds, and recorded visits are
+    written by a background thread in one batched UPDATE every
+    ``SOCIAL_BLOG_LAST_SEEN_FLUSH_INTERVAL`` seconds and at shutdown, so
+    ordinary page views never dirty the request session.
+    """
+
+    def __init__(self, app=None):
+        self._apps = weakref.WeakSet()
+        atexit.register(self._flush_all)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_LAST_SEEN_GRANULARITY', 60)
+        app.config.setdefault('SOCIAL_BLOG_LAST_SEEN_FLUSH_INTERVAL', 30)
+        app.extensions['last_seen'] = _BufferState()
+        self._apps.add(app)
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['last_seen']
+
+    def touch(self, user, now=None):
+        app = current_app._get_current_object()
+        state = self._state(app)
+        now = now or datetime.utcnow()
+        granularity = timedelta(seconds=app.config['SOCIAL_BLOG_LAST_SEEN_GRANULARITY'])
+        with state.lock:
+            seen = state.pending.get(user.id) or user.last_seen
+            if seen is not None and now - seen < granularity:
+                return False
+            state.pending[user.id] = now
+            if state.flusher is None:
+                state.flusher = threading.Thread(target=self._run, args=(weakref.ref(app),),
+                                                 daemon=True)
+                state.flusher.start()
+        set_committed_value(user, 'last_seen', now)
+        return True
+
+    def pending(self):
+        return dict(self._state().pending)
+
+    def flush(self):
+        from app import db
+        from app.models import User
+
+        state = self._state()
+        with state.lock:
+            pending, state.pending = state.pending, {}
+        if not pending:
+            return 0
+        users = User.__table__
+        stmt = users.update() \
+            .where(users.c.id == bindparam('user_id')) \
+            .values(last_seen=bindparam('seen'))
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt, [{'user_id': user_id, 'seen': seen}
+                                    for user_id, seen in pending.items()])
+        except Exception:
+            with state.lock:
+                for user_id, seen in pending.items():
+                    state.pending.setdefault(user_id, seen)
+            raise
+        return len(pending)
+
+    def _flush_app(self, app):
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception('Failed to flush last_seen updates')
+
+    def _flush_all(self):
+        for app in list(self._apps):
+            if app.extensions['last_seen'].pending:
+                self._flush_app(app)
+
+    def _run(self, app_ref):
+        # Only a weak reference is held between flushes so a discarded app
+        # can be collected; the thread ends with it.
+        while True:
+            app = app_ref()
+            if app is None:
+                return
+            interval = app.config['SOCIAL_BLOG_LAST_SEEN_FLUSH_INTERVAL']
+            del app
+            time.sleep(interval)
+            app = app_ref()
+            if app is None:
+                return
+            self._flush_app(app)
+            del app
@@ -0,0 +1,167 @@
+import atexit
+import queue
+import threading
+import time
+import weakref
+
+from flask import current_app
+
+
+class MailQueueFull(RuntimeError):
+    pass
+
+
+class _QueueState:
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.workers = []
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.send_seconds = 0.0
+        self.wait_seconds = 0.0
+
+
+_STOP = object()
+
+
+def _connect_mail(app):
+    from app import mail
+    return mail.connect()
+
+
+class MailQueue:
+    """Deliver outbound mail from a bounded queue.
+
+    A fixed pool of ``SOCIAL_BLOG_MAIL_WORKERS`` threads drains the queue
+    in batches of up to ``SOCIAL_BLOG_MAIL_BATCH_SIZE`` messages, sending
+    each batch over a single SMTP connection. Enqueueing blocks for at most
+    ``SOCIAL_BLOG_MAIL_ENQUEUE_TIMEOUT`` seconds once
+    ``SOCIAL_BLOG_MAIL_QUEUE_SIZE`` messages are waiting, failed batches are
+    retried with exponential backoff, and the queue is drained at exit.
+
+    ``connect`` may be replaced with any callable taking the app and
+    returning a context manager with a ``send(message)`` method.
+    """
+
+    def __init__(self, app=None, connect=_connect_mail):
+        self.connect = connect
+        self._apps = weakref.WeakSet()
+        atexit.register(self._shutdown_all)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_MAIL_WORKERS', 2)
+        app.config.setdefault('SOCIAL_BLOG_MAIL_QUEUE_SIZE', 1000)
+        app.config.setdefault('SOCIAL_BLOG_MAIL_BATCH_SIZE', 20)
+        app.config.setdefault('SOCIAL_BLOG_MAIL_ENQUEUE_TIMEOUT', 5)
+        app.config.setdefault('SOCIAL_BLOG_MAIL_RETRIES', 3)
+        app.config.setdefault('SOCIAL_BLOG_MAIL_RETRY_BACKOFF', 1.0)
+        app.extensions['mail_queue'] = _QueueState(app.config['SOCIAL_BLOG_MAIL_QUEUE_SIZE'])
+        self._apps.add(app)
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['mail_queue']
+
+    def enqueue(self, msg):
+        app = current_app._get_current_object()
+        state = self._state(app)
+        self._start_workers(app, state)
+        try:
+            state.queue.put((time.monotonic(), msg),
+                            timeout=app.config['SOCIAL_BLOG_MAIL_ENQUEUE_TIMEOUT'])
+        except queue.Full:
+            raise MailQueueFull('Outbound mail queue is full')
+        return msg
+
+    def stats(self, app=None):
+        state = self._state(app)
+        with state.lock:
+            return {
+                'queue_depth': state.queue.qsize(),
+                'sent': state.sent,
+                'failed': state.failed,
+                'retries': state.retries,
+                'send_seconds': state.send_seconds,
+                'wait_seconds': state.wait_seconds,
+            }
+
+    def flush(self, app=None):
+        self._state(app).queue.join()
+
+    def _shutdown_all(self):
+        # Apps with running workers are kept alive by them; the rest have
+        # nothing to drain.
+        for app in list(self._apps):
+            self.shutdown(app)
+
+    def shutdown(self, app):
+        state = self._state(app)
+        if not state.workers:
+            return
+        self.flush(app)
+        for _ in state.workers:
+            state.queue.put((None, _STOP))
+        for worker in state.workers:
+            worker.join()
+        state.workers = []
+
+    def _start_workers(self, app, state):
+        with state.lock:
+            if state.workers:
+                return
+            for _ in range(app.config['SOCIAL_BLOG_MAIL_WORKERS']):
+                worker = threading.Thread(target=self._work, args=(app, state), daemon=True)
+                worker.start()
+                state.workers.append(worker)
+
+    def _work(self, app, state):
+        batch_size = app.config['SOCIAL_BLOG_MAIL_BATCH_SIZE']
+        with app.app_context():
+            while True:
+                batch = [state.queue.get()]
+                while len(batch) < batch_size and batch[-1][1] is not _STOP:
+                    try:
+                        batch.append(state.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1][1] is _STOP
+                messages = [item for item in batch if item[1] is not _STOP]
+                try:
+                    self._send_batch(app, state, messages)
+                finally:
+                    for _ in batch:
+                        state.queue.task_done()
+                if stop:
+                    return
+
+    def _send_batch(self, app, state, batch):
+        retries = app.config['SOCIAL_BLOG_MAIL_RETRIES']
+        backoff = app.config['SOCIAL_BLOG_MAIL_RETRY_BACKOFF']
+        attempt = 0
+        while batch:
+            try:
+                with self.connect(app) as conn:
+                    while batch:
+                        enqueued, msg = batch[0]
+                        started = time.monotonic()
+                        conn.send(msg)
+                        finished = time.monotonic()
+                        batch.pop(0)
+                        with state.lock:
+                            state.sent += 1
+                            state.send_seconds += finished - started
+                            state.wait_seconds += started - enqueued
+            except Exception:
+                attempt += 1
+                if attempt > retries:
+                    app.logger.exception('Giving up on %d queued messages', len(batch))
+                    with state.lock:
+                        state.failed += len(batch)
+                    return
+                with state.lock:
+                    state.retries += 1
+                time.sleep(backoff * 2 ** (attempt - 1))
@@ -1,7 +1,25 @@
-from wtforms import TextAreaField, validators, SubmitField
+from wtforms import TextAreaField, validators, SubmitField, HiddenField, SelectField
 from flask_wtf import FlaskForm
 
 
 class PostForm(FlaskForm):
     body = TextAreaField("What's on your mind?", validators=[validators.DataRequired()])
-    submit = SubmitField('Post')
\ No newline at end of file
+    submit = SubmitField('Post')
+
+
+class CommentForm(FlaskForm):
+    body = TextAreaField('Leave a comment', validators=[validators.DataRequired()])
+    parent = HiddenField()
+    submit = SubmitField('Comment')
+
+
+class PostModerationForm(FlaskForm):
+    action = SelectField('Action', choices=[('hide', 'Hide'), ('show', 'Show again'),
+                                            ('dismiss', 'Dismiss report')])
+    submit = SubmitField('Apply to selected')
+
+
+class UserModerationForm(FlaskForm):
+    action = SelectField('Action')
+    role = SelectField('Role', coerce=int)
+    submit = SubmitField('Apply to selected')
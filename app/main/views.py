@@ -1,10 +1,17 @@
-from flask import render_template, url_for, redirect
-from flask_login import current_user
+from flask import render_template, url_for, redirect, request, current_app, abort, make_response, flash
+from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload
 
 from . import main
-from app.main.forms import PostForm
-from .. import db
-from ..models import Permissions, Post
+from app.main.forms import PostForm, CommentForm, PostModerationForm, UserModerationForm
+from .. import db, role_cache
+from ..models import Permissions, Post, User, Comment
+from ..decorators import permission_required
+from ..auth.forms import role_choices, ActionForm
+from ..replica import use_primary
+from ..pagination import keyset_paginate, InvalidCursor
+from ..http_cache import not_modified, content_version
+from ..feeds import feed_response
 
 
 @main.route('/index', methods=['GET', 'POST'])
@@ -15,9 +22,192 @@ def index():
                     author=current_user._get_current_object())
         db.session.add(post)
         db.session.commit()
-        db.session.commit()
         return redirect(url_for('.index'))
-    posts = Post.query.order_by(Post.time.desc()).all()
+    show_followed = current_user.is_authenticated and bool(request.cookies.get('show_followed'))
+    after = request.args.get('after')
+    before = request.args.get('before')
+    per_page = current_app.config['SOCIAL_BLOG_POSTS_PER_PAGE']
+    try:
+        if show_followed:
+            page = current_user.home_timeline(after=after, before=before, per_page=per_page)
+        else:
+            page = keyset_paginate(Post.query.options(joinedload(Post.author)),
+                                   Post.time, Post.id,
+                                   after=after, before=before, per_page=per_page)
+    except InvalidCursor:
+        abort(400)
+    response = not_modified(show_followed, content_version(page.items),
+                            page.next_cursor, page.prev_cursor)
+    if response is not None:
+        return response
+
+    return render_template('main/index.html', form=form, posts=page.items, page=page,
+                           show_followed=show_followed)
+
+
+@main.route('/all')
+@login_required
+def show_all():
+    resp = make_response(redirect(url_for('.index')))
+    resp.set_cookie('show_followed', '', max_age=30*24*60*60)
+    return resp
+
+
+@main.route('/followed')
+@login_required
+def show_followed():
+    resp = make_response(redirect(url_for('.index')))
+    resp.set_cookie('show_followed', '1', max_age=30*24*60*60)
+    return resp
+
+
+@main.route('/search')
+def search():
+    terms = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    posts, has_next = [], False
+    if terms and page >= 1:
+        posts, has_next = Post.search(terms, page=page,
+                                      per_page=current_app.config['SOCIAL_BLOG_POSTS_PER_PAGE'],
+                                      include_disabled=current_user.can(Permissions.MODERATE))
+    return render_template('main/search.html', terms=terms, posts=posts,
+                           page=page, has_next=has_next)
+
+
+@main.route('/feed.atom')
+def feed():
+    return feed_response()
+
+
+@main.route('/feed/<username>.atom')
+def user_feed(username):
+    return feed_response(User.query.filter_by(username=username).first_or_404())
+
+
+@main.route('/post/<int:id>', methods=['GET', 'POST'])
+def post(id):
+    post = Post.get_or_archived(id)
+    if post is None:
+        abort(404)
+    form = CommentForm()
+    if not post.archived and current_user.can(Permissions.COMMENT) and form.validate_on_submit():
+        parent = None
+        if form.parent.data:
+            parent = Comment.query.filter_by(id=int(form.parent.data), post_id=post.id).first()
+            if parent is None or parent.disabled:
+                abort(400)
+        comment = Comment(body=form.body.data, post=post, parent=parent,
+                          author=current_user._get_current_object())
+        db.session.add(comment)
+        db.session.commit()
+        flash('Your comment has been published.')
+        return redirect(url_for('.post', id=post.id, _anchor=f'comment-{comment.id}'))
+    form.parent.data = request.args.get('reply_to', type=int)
+    moderate = current_user.can(Permissions.MODERATE)
+    page = Comment.thread(post, after=request.args.get('after'),
+                          per_page=current_app.config['SOCIAL_BLOG_COMMENTS_PER_PAGE'],
+                          include_disabled=moderate)
+    return render_template('main/post.html', post=post, form=form, comments=page.items,
+                           page=page, moderate=moderate, action_form=ActionForm())
+
+
+@main.route('/moderate/comment/<int:id>/hide', methods=['POST'])
+@use_primary
+@login_required
+@permission_required(Permissions.MODERATE)
+def hide_comment(id):
+    if not ActionForm().validate_on_submit():
+        abort(400)
+    comment = Comment.query.get_or_404(id)
+    post_id = comment.post_id
+    hidden = comment.hide_subtree()
+    db.session.commit()
+    flash(f'{hidden} comments hidden.')
+    return redirect(url_for('.post', id=post_id))
+
+
+@main.route('/flag/post/<int:id>', methods=['GET', 'POST'])
+@use_primary
+@login_required
+@permission_required(Permissions.COMMENT)
+def flag_post(id):
+    post = Post.query.get_or_404(id)
+    form = ActionForm()
+    if form.validate_on_submit():
+        Post.flag(post.id)
+        db.session.commit()
+        flash('The post has been reported to the moderators.')
+        return redirect(url_for('.post', id=post.id))
+    # Post fragments are cached for every viewer, so the Report link leads
+    # here and the CSRF-protected form lives on this page instead.
+    return render_template('main/flag_post.html', post=post, form=form)
+
+
+@main.route('/flag/user/<username>', methods=['POST'])
+@use_primary
+@login_required
+@permission_required(Permissions.COMMENT)
+def flag_user(username):
+    if not ActionForm().validate_on_submit():
+        abort(400)
+    user = User.query.filter_by(username=username).first_or_404()
+    User.flag(user.id)
+    db.session.commit()
+    flash('The user has been reported to the moderators.')
+    return redirect(url_for('auth.user', username=username))
+
+
+def _flag_key(item):
+    return item.flagged_at, item.id
+
+
+def _flagged_page(query, model):
+    try:
+        return keyset_paginate(query.filter(model.flagged_at.isnot(None)),
+                               model.flagged_at, model.id,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               per_page=current_app.config['SOCIAL_BLOG_POSTS_PER_PAGE'],
+                               key=_flag_key)
+    except InvalidCursor:
+        abort(400)
+
+
+@main.route('/moderate/posts', methods=['GET', 'POST'])
+@login_required
+@permission_required(Permissions.MODERATE)
+def moderate_posts():
+    form = PostModerationForm()
+    if form.validate_on_submit():
+        ids = request.form.getlist('ids', type=int)
+        if ids:
+            changed = Post.moderate(ids, form.action.data)
+            db.session.commit()
+            flash(f'{changed} posts updated.')
+        return redirect(url_for('.moderate_posts', **request.args))
+    page = _flagged_page(Post.query.options(joinedload(Post.author)), Post)
+    return render_template('main/moderate_posts.html', form=form, posts=page.items, page=page)
 
-    return render_template('main/index.html', form=form, posts=posts)
 
+@main.route('/moderate/users', methods=['GET', 'POST'])
+@login_required
+@permission_required(Permissions.MODERATE)
+def moderate_users():
+    form = UserModerationForm()
+    form.action.choices = [('confirm', 'Confirm account'), ('dismiss', 'Dismiss report')]
+    if current_user.is_admin():
+        form.action.choices.append(('role', 'Change role'))
+        form.role.choices = role_choices()
+    else:
+        del form.role
+    if form.validate_on_submit():
+        ids = request.form.getlist('ids', type=int)
+        if ids:
+            role_id = form.role.data if 'role' in form else None
+            changed = User.moderate(ids, form.action.data, role_id=role_id)
+            db.session.commit()
+            flash(f'{changed} users updated.')
+        return redirect(url_for('.moderate_users', **request.args))
+    page = _flagged_page(User.query, User)
+    return render_template('main/moderate_users.html', form=form, users=page.items, page=page,
+                           roles=role_cache.roles())
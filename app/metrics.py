@@ -0,0 +1,147 @@
+import bisect
+import threading
+import time
+
+from flask import Response, current_app, g, request, before_render_template, template_rendered
+
+from app.query_guard import query_count, query_time
+
+
+class _EndpointStats:
+
+    def __init__(self, buckets):
+        self.buckets = [0] * len(buckets)
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Metrics:
+    """Opt-in per-request instrumentation.
+
+    When ``SOCIAL_BLOG_METRICS`` is set every request records its latency
+    in a per-endpoint histogram together with the number and duration of
+    its SQL statements and the time spent rendering templates. The totals,
+    mail queue and fragment cache counters are served in the Prometheus
+    text format at ``/metrics``; ``SOCIAL_BLOG_METRICS_HEADERS`` also adds
+    ``X-Query-Count`` and ``Server-Timing`` to each response. Streamed
+    responses are recorded once their body has been sent and closed, and
+    carry no timing headers because those go out before the body.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_METRICS', False)
+        app.config.setdefault('SOCIAL_BLOG_METRICS_HEADERS', False)
+        app.config.setdefault('SOCIAL_BLOG_METRICS_BUCKETS',
+                              (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+        if not app.config['SOCIAL_BLOG_METRICS']:
+            return
+        app.extensions['metrics'] = {'endpoints': {}, 'lock': threading.Lock()}
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def _before_request(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = query_count()
+        g._metrics_query_time = query_time()
+        g._metrics_template_time = 0.0
+
+    def _before_render(self, app, template, context, **extra):
+        g.setdefault('_metrics_render_started', []).append(time.perf_counter())
+
+    def _after_render(self, app, template, context, **extra):
+        started = g.get('_metrics_render_started')
+        if started:
+            elapsed = time.perf_counter() - started.pop()
+            if not started:
+                g._metrics_template_time = g.get('_metrics_template_time', 0.0) + elapsed
+
+    def _after_request(self, response):
+        if '_metrics_started' not in g:
+            return response
+        app = current_app._get_current_object()
+        endpoint = request.endpoint or 'unknown'
+        # Keep the request's globals: a streamed body still adds queries and
+        # template time to them after this hook, until the stream is closed.
+        globals_ = g._get_current_object()
+        if response.is_streamed:
+            response.call_on_close(lambda: self._record(app, endpoint, globals_))
+            return response
+        queries, sql_seconds, template_seconds, elapsed = self._record(app, endpoint, globals_)
+        if app.config['SOCIAL_BLOG_METRICS_HEADERS']:
+            response.headers['X-Query-Count'] = str(queries)
+            response.headers['Server-Timing'] = \
+                f'db;dur={sql_seconds * 1000:.2f}, ' \
+                f'tpl;dur={template_seconds * 1000:.2f}, ' \
+                f'total;dur={elapsed * 1000:.2f}'
+        return response
+
+    def _record(self, app, endpoint, globals_):
+        elapsed = time.perf_counter() - globals_._metrics_started
+        queries = query_count(globals_) - globals_._metrics_queries
+        sql_seconds = query_time(globals_) - globals_._metrics_query_time
+        template_seconds = globals_.get('_metrics_template_time', 0.0)
+        buckets = app.config['SOCIAL_BLOG_METRICS_BUCKETS']
+        state = app.extensions['metrics']
+        with state['lock']:
+            stats = state['endpoints'].get(endpoint)
+            if stats is None:
+                stats = state['endpoints'][endpoint] = _EndpointStats(buckets)
+            index = bisect.bisect_left(buckets, elapsed)
+            if index < len(buckets):
+                stats.buckets[index] += 1
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.sql_queries += queries
+            stats.sql_seconds += sql_seconds
+            stats.template_seconds += template_seconds
+        return queries, sql_seconds, template_seconds, elapsed
+
+    def render(self):
+        from app import mail_queue, fragment_cache
+
+        app = current_app._get_current_object()
+        state = app.extensions['metrics']
+        buckets = app.config['SOCIAL_BLOG_METRICS_BUCKETS']
+        lines = [
+            '# TYPE socialblog_request_duration_seconds histogram',
+        ]
+        with state['lock']:
+            endpoints = sorted(state['endpoints'].items())
+            for endpoint, stats in endpoints:
+                label = f'endpoint="{endpoint}"'
+                cumulative = 0
+                for le, count in zip(buckets, stats.buckets):
+                    cumulative += count
+                    lines.append(f'socialblog_request_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f'socialblog_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f'socialblog_request_duration_seconds_sum{{{label}}} {stats.seconds:.6f}')
+                lines.append(f'socialblog_request_duration_seconds_count{{{label}}} {stats.count}')
+            for name, attr in (('sql_queries_total', 'sql_queries'),
+                               ('sql_seconds_total', 'sql_seconds'),
+                               ('template_seconds_total', 'template_seconds')):
+                lines.append(f'# TYPE socialblog_{name} counter')
+                for endpoint, stats in endpoints:
+                    lines.append(f'socialblog_{name}{{endpoint="{endpoint}"}} {getattr(stats, attr)}')
+
+        mail = mail_queue.stats(app)
+        lines += [
+            '# TYPE socialblog_mail_queue_depth gauge',
+            f'socialblog_mail_queue_depth {mail["queue_depth"]}',
+        ]
+        for key in ('sent', 'failed', 'retries', 'send_seconds', 'wait_seconds'):
+            lines.append(f'# TYPE socialblog_mail_{key}_total counter')
+            lines.append(f'socialblog_mail_{key}_total {mail[key]}')
+        for key, value in fragment_cache.stats().items():
+            lines.append(f'# TYPE socialblog_fragment_cache_{key}_total counter')
+            lines.append(f'socialblog_fragment_cache_{key}_total {value}')
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -1,12 +1,18 @@
 from datetime import datetime
+from itertools import chain
 import hashlib
 
+import bleach
+from markdown import markdown
+
 from flask_login import UserMixin, AnonymousUserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from flask import current_app, request
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app import db, login_manager
+from app import db, login_manager, last_seen, role_cache, identity_cache, fragment_cache, search, \
+    password_hasher
+from app.pagination import keyset_paginate, merge_keyset_pages, KeysetPage
 
 
 class Permissions:
@@ -79,6 +85,34 @@ class Role(db.Model):
             self.permissions -= permission
 
 
+class Follow(db.Model):
+    __tablename__ = 'follows'
+    __table_args__ = (
+        db.Index('ix_follows_followed_follower', 'followed_id', 'follower_id'),
+    )
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    followed_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def on_inserted(mapper, connection, target):
+        User.adjust_counter(connection, target.follower_id, 'followed_count', 1)
+        User.adjust_counter(connection, target.followed_id, 'followers_count', 1)
+        Notification.notify(connection, target.followed_id, 'follow', actor_id=target.follower_id)
+
+    @staticmethod
+    def on_deleted(mapper, connection, target):
+        User.adjust_counter(connection, target.follower_id, 'followed_count', -1)
+        User.adjust_counter(connection, target.followed_id, 'followers_count', -1)
+        users = User.__table__
+        followers = connection.scalar(
+            db.select([users.c.followers_count]).where(users.c.id == target.followed_id))
+        if followers == current_app.config['SOCIAL_BLOG_FANOUT_CUTOFF']:
+            # Back under the cutoff: the author's posts are no longer pulled,
+            # so push the ones written while they were not fanned out.
+            TimelineEntry.backfill_followers(connection, target.followed_id)
+
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -93,7 +127,28 @@ class User(db.Model, UserMixin):
     member_since = db.Column(db.DateTime(), default=datetime.utcnow)
     last_seen = db.Column(db.DateTime(), default=datetime.utcnow)
     avatar_hash = db.Column(db.String(32))
+    profile_version = db.Column(db.Integer, default=0, nullable=False)
+    posts_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    followers_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    followed_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    flagged_at = db.Column(db.DateTime, index=True)
     posts = db.relationship('Post', backref='author', lazy='dynamic')
+    archived_posts = db.relationship('ArchivedPost', backref='author', lazy='dynamic')
+    comments = db.relationship('Comment', backref='author', lazy='dynamic')
+    archived_comments = db.relationship('ArchivedComment', backref='author', lazy='dynamic')
+    followed = db.relationship('Follow',
+                               foreign_keys=[Follow.follower_id],
+                               backref=db.backref('follower', lazy='joined'),
+                               lazy='dynamic',
+                               cascade='all, delete-orphan')
+    followers = db.relationship('Follow',
+                                foreign_keys=[Follow.followed_id],
+                                backref=db.backref('followed', lazy='joined'),
+                                lazy='dynamic',
+                                cascade='all, delete-orphan')
+
+    profile_fields = ('email', 'username', 'role_id', 'confirmed',
+                      'name', 'location', 'about_me', 'avatar_hash')
 
     def __init__(self, **kwargs):
         super(User, self).__init__(**kwargs)
@@ -135,33 +190,716 @@ class User(db.Model, UserMixin):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     def can(self, permissions):
-        return self.role is not None and self.role.has_permission(permissions)
+        if self.role_id is None or 'role' in self.__dict__:
+            return self.role is not None and self.role.has_permission(permissions)
+        role_permissions = role_cache.permissions(self.role_id)
+        return role_permissions is not None and role_permissions & permissions == permissions
 
     def is_admin(self):
         return self.can(Permissions.ADMIN)
 
     def ping(self):
-        self.last_seen = datetime.utcnow()
-        db.session.add(self)
+        return last_seen.touch(self)
+
+    def is_following(self, user):
+        return user.id is not None and \
+            self.followed.filter_by(followed_id=user.id).first() is not None
+
+    def is_followed_by(self, user):
+        return user.id is not None and \
+            self.followers.filter_by(follower_id=user.id).first() is not None
+
+    def follow(self, user):
+        if user.id == self.id or self.is_following(user):
+            return
+        db.session.add(Follow(follower=self, followed=user))
+        if not user.is_high_fanout():
+            TimelineEntry.backfill(self, user)
+
+    def unfollow(self, user):
+        f = self.followed.filter_by(followed_id=user.id).first()
+        if f:
+            db.session.delete(f)
+            TimelineEntry.forget(self, user)
+
+    def is_high_fanout(self):
+        return self.followers_count > current_app.config['SOCIAL_BLOG_FANOUT_CUTOFF']
+
+    def high_fanout_followed_ids(self):
+        follows = Follow.__table__
+        users = User.__table__
+        return [row[0] for row in db.session.execute(
+            db.select([follows.c.followed_id])
+            .select_from(follows.join(users, users.c.id == follows.c.followed_id))
+            .where(follows.c.follower_id == self.id)
+            .where(users.c.followers_count > current_app.config['SOCIAL_BLOG_FANOUT_CUTOFF']))]
+
+    @staticmethod
+    def adjust_counter(connection, user_id, counter, delta):
+        if user_id is None:
+            return
+        users = User.__table__
+        connection.execute(users.update()
+                           .where(users.c.id == user_id)
+                           .values({counter: users.c[counter] + delta}))
+        # Core updates bypass the ORM, so drop the cached identity by hand.
+        db.session.info.setdefault('stale_users', set()).add(user_id)
+
+    @staticmethod
+    def reconcile_counters(batch_size=1000):
+        users = User.__table__
+        posts = Post.__table__
+        archive = ArchivedPost.__table__
+        follows = Follow.__table__
+        counters = {
+            'posts_count': db.select([db.func.count()])
+                .where(posts.c.author_id == users.c.id).as_scalar() +
+                db.select([db.func.count()])
+                .where(archive.c.author_id == users.c.id).as_scalar(),
+            'followers_count': db.select([db.func.count()])
+                .where(follows.c.followed_id == users.c.id).as_scalar(),
+            'followed_count': db.select([db.func.count()])
+                .where(follows.c.follower_id == users.c.id).as_scalar(),
+        }
+        last_id, done = 0, 0
+        while True:
+            ids = [row[0] for row in db.session.execute(
+                db.select([users.c.id])
+                .where(users.c.id > last_id)
+                .order_by(users.c.id)
+                .limit(batch_size))]
+            if not ids:
+                return done
+            db.session.execute(users.update()
+                               .where(users.c.id.between(ids[0], ids[-1]))
+                               .values(counters))
+            db.session.commit()
+            last_id = ids[-1]
+            done += len(ids)
+
+    def home_timeline(self, after=None, before=None, per_page=20):
+        query = Post.query.options(db.joinedload(Post.author)) \
+            .join(TimelineEntry, TimelineEntry.post_id == Post.id) \
+            .filter(TimelineEntry.user_id == self.id)
+        pages = [keyset_paginate(query, TimelineEntry.time, TimelineEntry.post_id,
+                                 after=after, before=before, per_page=per_page)]
+        high_fanout = self.high_fanout_followed_ids()
+        if high_fanout:
+            query = Post.query.options(db.joinedload(Post.author)) \
+                .filter(Post.author_id.in_(high_fanout))
+            pages.append(keyset_paginate(query, Post.time, Post.id,
+                                         after=after, before=before, per_page=per_page))
+        return merge_keyset_pages(pages, per_page=per_page, before=before)
+
+    def has_archived_posts(self):
+        return self.archived_posts.with_entities(ArchivedPost.id).first() is not None
+
+    @staticmethod
+    def flag(user_id):
+        users = User.__table__
+        db.session.execute(users.update()
+                           .where(users.c.id == user_id)
+                           .where(users.c.flagged_at.is_(None))
+                           .values(flagged_at=datetime.utcnow()))
+
+    @staticmethod
+    def moderate(ids, action, role_id=None):
+        """Apply ``action`` to the users in ``ids`` with one UPDATE and clear
+        their flags. Returns the number of users changed."""
+        users = User.__table__
+        values = {'flagged_at': None}
+        if action == 'confirm':
+            values['confirmed'] = True
+        elif action == 'role':
+            values['role_id'] = role_id
+        elif action != 'dismiss':
+            raise ValueError(f'Unknown moderation action: {action}')
+        if action != 'dismiss':
+            values['profile_version'] = users.c.profile_version + 1
+        changed = db.session.execute(users.update()
+                                     .where(users.c.id.in_(ids))
+                                     .values(values)).rowcount
+        db.session.info.setdefault('stale_users', set()).update(ids)
+        return changed
+
+    @staticmethod
+    def on_profile_changed(mapper, connection, target):
+        state = db.inspect(target)
+        if state.attrs.email.history.has_changes() and target.email is not None:
+            target.avatar_hash = hashlib.md5(target.email.encode('utf-8')).hexdigest()
+        if any(state.attrs[field].history.has_changes() for field in User.profile_fields):
+            target.profile_version = (target.profile_version or 0) + 1
+
+
+db.event.listen(User, 'before_update', User.on_profile_changed)
+db.event.listen(Follow, 'after_insert', Follow.on_inserted)
+db.event.listen(Follow, 'after_delete', Follow.on_deleted)
 
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    # Archived ids must never be handed out again, so SQLite may not reuse them.
+    __table_args__ = {'sqlite_autoincrement': True}
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.Text)
+    body_html = db.Column(db.Text)
     time = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    comments_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    disabled = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    flagged_at = db.Column(db.DateTime, index=True)
+    comments = db.relationship('Comment', backref='post', lazy='dynamic')
+
+    archived = False
+    content_fields = ('body', 'body_html', 'disabled')
+
+    allowed_tags = ['a', 'abbr', 'acronym', 'b', 'blockquote', 'code',
+                    'em', 'i', 'li', 'ol', 'pre', 'strong', 'ul',
+                    'h1', 'h2', 'h3', 'p']
+
+    @staticmethod
+    def render_body(value):
+        if value is None:
+            return None
+        return bleach.linkify(bleach.clean(
+            markdown(value, output_format='html'),
+            tags=Post.allowed_tags, strip=True))
+
+    @staticmethod
+    def on_changed_body(target, value, oldvalue, initiator):
+        target.body_html = Post.render_body(value)
+
+    @staticmethod
+    def on_content_changed(mapper, connection, target):
+        state = db.inspect(target)
+        if any(state.attrs[field].history.has_changes() for field in Post.content_fields):
+            target.version = (target.version or 0) + 1
+
+    @staticmethod
+    def backfill_body_html(batch_size=500):
+        posts = Post.__table__
+        update = posts.update() \
+            .where(posts.c.id == db.bindparam('post_id')) \
+            .values(body_html=db.bindparam('html'), version=posts.c.version + 1)
+        last_id, done = 0, 0
+        while True:
+            rows = db.session.execute(
+                db.select([posts.c.id, posts.c.body])
+                .where(posts.c.id > last_id)
+                .where(posts.c.body_html.is_(None))
+                .order_by(posts.c.id)
+                .limit(batch_size)).fetchall()
+            if not rows:
+                return done
+            db.session.execute(update, [{'post_id': id, 'html': Post.render_body(body)}
+                                        for id, body in rows])
+            db.session.commit()
+            last_id = rows[-1][0]
+            done += len(rows)
+
+    @staticmethod
+    def search(terms, page=1, per_page=20, include_disabled=False):
+        if not search.is_supported():
+            query = Post.query.options(db.joinedload(Post.author)) \
+                .filter(Post.body.ilike(f'%{terms}%'))
+            if not include_disabled:
+                query = query.filter(Post.disabled.is_(False))
+            posts = query.order_by(Post.time.desc(), Post.id.desc()) \
+                .offset((page - 1) * per_page).limit(per_page + 1).all()
+            return posts[:per_page], len(posts) > per_page
+        ids, has_next = search.search_post_ids(terms, page, per_page,
+                                               include_disabled=include_disabled)
+        if not ids:
+            return [], False
+        posts = {post.id: post for post in
+                 Post.query.options(db.joinedload(Post.author)).filter(Post.id.in_(ids))}
+        return [posts[id] for id in ids if id in posts], has_next
+
+    @staticmethod
+    def archive(before, batch_size=500):
+        """Move posts written before ``before`` to ``posts_archive``, and their
+        comments to ``comments_archive``, oldest first, one batch per
+        transaction. Posts that pending notifications still point at stay
+        until the digest has gone out. Returns the number moved."""
+        posts = Post.__table__
+        archive = ArchivedPost.__table__
+        comments = Comment.__table__
+        comments_archive = ArchivedComment.__table__
+        timelines = TimelineEntry.__table__
+        notifications = Notification.__table__
+        columns = [column.name for column in archive.columns]
+        comment_columns = [column.name for column in comments_archive.columns]
+        notified = db.exists().where(notifications.c.post_id == posts.c.id)
+        done = 0
+        while True:
+            rows = db.session.execute(
+                db.select([posts.c.id, posts.c.author_id])
+                .where(posts.c.time < before)
+                .where(~notified)
+                .order_by(posts.c.time, posts.c.id)
+                .limit(batch_size)).fetchall()
+            if not rows:
+                return done
+            ids = [id for id, _ in rows]
+            db.session.execute(archive.insert().from_select(
+                columns, db.select([posts.c[name] for name in columns])
+                .where(posts.c.id.in_(ids))))
+            db.session.execute(comments_archive.insert().from_select(
+                comment_columns, db.select([comments.c[name] for name in comment_columns])
+                .where(comments.c.post_id.in_(ids))))
+            db.session.execute(timelines.delete().where(timelines.c.post_id.in_(ids)))
+            db.session.execute(comments.delete().where(comments.c.post_id.in_(ids)))
+            db.session.execute(posts.delete().where(posts.c.id.in_(ids)))
+            db.session.info.setdefault('stale_feeds', set()).update(
+                author_id for _, author_id in rows)
+            db.session.commit()
+            done += len(rows)
+
+    @staticmethod
+    def get_or_archived(id):
+        """The post with ``id``, looked up in the archive when it has moved."""
+        return Post.query.get(id) or ArchivedPost.query.get(id)
+
+    @staticmethod
+    def versions(author_id):
+        """Count, newest id and summed edit versions and comment counts of
+        an author's posts, which change whenever any of them would render
+        differently."""
+        return tuple(db.session.query(db.func.count(Post.id), db.func.max(Post.id),
+                                      db.func.sum(Post.version),
+                                      db.func.sum(Post.comments_count))
+                     .filter(Post.author_id == author_id).one())
+
+    @staticmethod
+    def flag(post_id):
+        posts = Post.__table__
+        db.session.execute(posts.update()
+                           .where(posts.c.id == post_id)
+                           .where(posts.c.flagged_at.is_(None))
+                           .values(flagged_at=datetime.utcnow()))
+
+    @staticmethod
+    def moderate(ids, action):
+        """Hide the posts in ``ids``, show them again or dismiss their flags,
+        with one UPDATE. Returns the number of posts changed."""
+        posts = Post.__table__
+        values = {'flagged_at': None}
+        if action in ('hide', 'show'):
+            values['disabled'] = action == 'hide'
+            values['version'] = posts.c.version + 1
+        elif action != 'dismiss':
+            raise ValueError(f'Unknown moderation action: {action}')
+        changed = db.session.execute(posts.update()
+                                     .where(posts.c.id.in_(ids))
+                                     .values(values)).rowcount
+        if action != 'dismiss':
+            # Bulk updates bypass the flush hooks, so mark the cached posts
+            # and feeds stale by hand.
+            authors = db.session.execute(db.select([posts.c.author_id]).distinct()
+                                         .where(posts.c.id.in_(ids)))
+            db.session.info.setdefault('stale_posts', set()).update(ids)
+            db.session.info.setdefault('stale_feeds', set()).update(row[0] for row in authors)
+        return changed
+
+    @staticmethod
+    def adjust_counter(connection, post_id, counter, delta):
+        if post_id is None or not delta:
+            return
+        posts = Post.__table__
+        connection.execute(posts.update()
+                           .where(posts.c.id == post_id)
+                           .values({counter: posts.c[counter] + delta}))
+
+    @staticmethod
+    def on_inserted(mapper, connection, target):
+        User.adjust_counter(connection, target.author_id, 'posts_count', 1)
+        TimelineEntry.fan_out(connection, target)
+
+    @staticmethod
+    def on_deleted(mapper, connection, target):
+        User.adjust_counter(connection, target.author_id, 'posts_count', -1)
+
+
+db.Index('ix_posts_author_time', Post.author_id, Post.time.desc(), Post.id.desc())
+db.event.listen(Post.body, 'set', Post.on_changed_body)
+db.event.listen(Post, 'before_update', Post.on_content_changed)
+db.event.listen(Post, 'after_insert', Post.on_inserted)
+db.event.listen(Post, 'after_delete', Post.on_deleted)
+search.install(Post.__table__)
+
+
+class ArchivedPost(db.Model):
+    """A post moved out of ``posts`` by :meth:`Post.archive`.
+
+    Archived posts keep their id, are read-only and are only read when a
+    page explicitly asks for older content, so the hot ``posts`` table and
+    its indexes stay small.
+    """
+    __tablename__ = 'posts_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    body = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    time = db.Column(db.DateTime)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    comments_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    disabled = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    archived = True
+
+
+db.Index('ix_posts_archive_author_time', ArchivedPost.author_id, ArchivedPost.time.desc(),
+         ArchivedPost.id.desc())
+
+class Comment(db.Model):
+    """A reply to a post or to another comment.
+
+    ``path`` is the materialized path of the comment: the fixed-width
+    base-36 ids of its ancestors and itself joined with dots. Ordering a
+    post's comments by path yields the thread depth first, and a subtree
+    is the indexed range ``[path, path + '/')``.
+    """
+    __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_post_path', 'post_id', 'path'),
+        {'sqlite_autoincrement': True},
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    body = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    time = db.Column(db.DateTime, default=datetime.utcnow)
+    disabled = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'))
+    path = db.Column(db.String(255))
+
+    segment_width = 6
+    allowed_tags = ['a', 'abbr', 'acronym', 'b', 'code', 'em', 'i', 'strong']
+
+    parent = db.relationship('Comment', remote_side=[id])
+
+    @staticmethod
+    def on_changed_body(target, value, oldvalue, initiator):
+        target.body_html = None if value is None else bleach.linkify(bleach.clean(
+            markdown(value, output_format='html'),
+            tags=Comment.allowed_tags, strip=True))
+
+    @property
+    def depth(self):
+        return self.path.count('.') if self.path else 0
+
+    @staticmethod
+    def segment(id):
+        digits = ''
+        while id:
+            id, digit = divmod(id, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        return digits.rjust(Comment.segment_width, '0')
+
+    @staticmethod
+    def subtree_range(path):
+        return Comment.path >= path, Comment.path < path + '/'
+
+    @staticmethod
+    def thread(post, after=None, per_page=50, include_disabled=False):
+        """One page of ``post``'s comments in thread order, continuing after
+        the comment whose path is ``after``."""
+        model = ArchivedComment if post.archived else Comment
+        query = model.query.options(db.joinedload(model.author)) \
+            .filter(model.post_id == post.id)
+        if not include_disabled:
+            query = query.filter(model.disabled == False)  # noqa: E712
+        if after:
+            query = query.filter(model.path > after)
+        items = query.order_by(model.path).limit(per_page + 1).all()
+        next_cursor = items[per_page - 1].path if len(items) > per_page else None
+        return KeysetPage(items[:per_page], next_cursor)
+
+    def subtree(self, include_disabled=False):
+        query = Comment.query.filter(Comment.post_id == self.post_id,
+                                     *Comment.subtree_range(self.path))
+        if not include_disabled:
+            query = query.filter(Comment.disabled == False)  # noqa: E712
+        return query.order_by(Comment.path)
+
+    def hide_subtree(self):
+        """Disable this comment and all its replies in one UPDATE."""
+        comments = Comment.__table__
+        hidden = db.session.execute(
+            comments.update()
+            .where(comments.c.post_id == self.post_id)
+            .where(comments.c.path >= self.path)
+            .where(comments.c.path < self.path + '/')
+            .where(comments.c.disabled == False)  # noqa: E712
+            .values(disabled=True)).rowcount
+        Post.adjust_counter(db.session, self.post_id, 'comments_count', -hidden)
+        db.session.expire_all()
+        return hidden
+
+    @staticmethod
+    def on_inserted(mapper, connection, target):
+        comments = Comment.__table__
+        posts = Post.__table__
+        path = Comment.segment(target.id)
+        parent_author_id = None
+        if target.parent_id is not None:
+            parent_path, parent_author_id = connection.execute(
+                db.select([comments.c.path, comments.c.author_id])
+                .where(comments.c.id == target.parent_id)).first()
+            path = f'{parent_path}.{path}'
+        connection.execute(comments.update()
+                           .where(comments.c.id == target.id)
+                           .values(path=path))
+        set_committed_value(target, 'path', path)
+        if target.disabled:
+            # Hidden from the start: nothing to count and nobody to tell.
+            return
+        Post.adjust_counter(connection, target.post_id, 'comments_count', 1)
+        if parent_author_id is not None:
+            Notification.notify(connection, parent_author_id, 'reply', actor_id=target.author_id,
+                                post_id=target.post_id, comment_id=target.id)
+        post_author_id = connection.scalar(
+            db.select([posts.c.author_id]).where(posts.c.id == target.post_id))
+        if post_author_id != parent_author_id:
+            Notification.notify(connection, post_author_id, 'comment', actor_id=target.author_id,
+                                post_id=target.post_id, comment_id=target.id)
+
+    @staticmethod
+    def on_deleted(mapper, connection, target):
+        if not target.disabled:
+            Post.adjust_counter(connection, target.post_id, 'comments_count', -1)
+
+
+db.event.listen(Comment.body, 'set', Comment.on_changed_body)
+db.event.listen(Comment, 'after_insert', Comment.on_inserted)
+db.event.listen(Comment, 'after_delete', Comment.on_deleted)
+
+
+class ArchivedComment(db.Model):
+    """A comment moved to ``comments_archive`` together with its post."""
+    __tablename__ = 'comments_archive'
+    __table_args__ = (
+        db.Index('ix_comments_archive_post_path', 'post_id', 'path'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    body = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    time = db.Column(db.DateTime)
+    disabled = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    post_id = db.Column(db.Integer, db.ForeignKey('posts_archive.id'), nullable=False)
+    parent_id = db.Column(db.Integer)
+    path = db.Column(db.String(255))
+
+    depth = Comment.depth
+
+
+class Notification(db.Model):
+    """An event waiting to go out in its recipient's email digest.
+
+    The table is an outbox: rows are written alongside the change that
+    caused them and deleted once a digest including them has been sent.
+    """
+    __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_recipient', 'recipient_id', 'id'),
+        db.Index('ix_notifications_post', 'post_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'))
+    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'))
+    time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    kinds = ('follow', 'comment', 'reply', 'new_user')
+
+    @staticmethod
+    def notify(connection, recipient_id, kind, actor_id=None, post_id=None, comment_id=None):
+        if recipient_id is None or recipient_id == actor_id:
+            return
+        connection.execute(Notification.__table__.insert().values(
+            recipient_id=recipient_id, kind=kind, actor_id=actor_id, post_id=post_id,
+            comment_id=comment_id, time=datetime.utcnow()))
+
+    @staticmethod
+    def notify_admin(user):
+        """Tell the administrator about ``user``'s registration in one INSERT ... SELECT."""
+        admin_email = current_app.config['SOCIAL_BLOG_ADMIN']
+        if not admin_email:
+            return
+        users = User.__table__
+        admins = db.select([users.c.id, db.literal('new_user'), db.literal(user.id),
+                            db.literal(datetime.utcnow())]) \
+            .where(users.c.email == admin_email) \
+            .where(users.c.id != user.id)
+        db.session.execute(Notification.__table__.insert().from_select(
+            ['recipient_id', 'kind', 'actor_id', 'time'], admins))
+
+
+class TimelineEntry(db.Model):
+    __tablename__ = 'timelines'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    time = db.Column(db.DateTime, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True)
+
+    @staticmethod
+    def fan_out(connection, post):
+        if post.author_id is None:
+            return
+        timelines = TimelineEntry.__table__
+        follows = Follow.__table__
+        connection.execute(timelines.insert(), user_id=post.author_id,
+                           time=post.time, post_id=post.id)
+        users = User.__table__
+        followers = connection.scalar(
+            db.select([users.c.followers_count]).where(users.c.id == post.author_id))
+        if followers > current_app.config['SOCIAL_BLOG_FANOUT_CUTOFF']:
+            return
+        connection.execute(timelines.insert().from_select(
+            ['user_id', 'time', 'post_id'],
+            db.select([follows.c.follower_id,
+                       db.literal(post.time, db.DateTime),
+                       db.literal(post.id, db.Integer)])
+            .where(follows.c.followed_id == post.author_id)))
+
+    @staticmethod
+    def rebuild():
+        timelines = TimelineEntry.__table__
+        posts = Post.__table__
+        follows = Follow.__table__
+        users = User.__table__
+        db.session.execute(timelines.delete())
+        db.session.execute(timelines.insert().from_select(
+            ['user_id', 'time', 'post_id'],
+            db.select([posts.c.author_id, posts.c.time, posts.c.id])
+            .where(posts.c.author_id.isnot(None))))
+        db.session.execute(timelines.insert().from_select(
+            ['user_id', 'time', 'post_id'],
+            db.select([follows.c.follower_id, posts.c.time, posts.c.id])
+            .select_from(follows
+                         .join(posts, posts.c.author_id == follows.c.followed_id)
+                         .join(users, users.c.id == follows.c.followed_id))
+            .where(follows.c.follower_id != follows.c.followed_id)
+            .where(users.c.followers_count <= current_app.config['SOCIAL_BLOG_FANOUT_CUTOFF'])))
+        db.session.commit()
+
+    @staticmethod
+    def backfill(user, followed):
+        timelines = TimelineEntry.__table__
+        posts = Post.__table__
+        recent = db.select([db.literal(user.id, db.Integer), posts.c.time, posts.c.id]) \
+            .where(posts.c.author_id == followed.id) \
+            .order_by(posts.c.time.desc()) \
+            .limit(current_app.config['SOCIAL_BLOG_FANOUT_BACKFILL'])
+        db.session.execute(timelines.insert()
+                           .prefix_with('OR IGNORE', dialect='sqlite')
+                           .from_select(['user_id', 'time', 'post_id'], recent))
+
+    @staticmethod
+    def backfill_followers(connection, author_id):
+        """Give every follower of ``author_id`` the author's recent posts they
+        are missing, as :meth:`backfill` does for a single new follower."""
+        timelines = TimelineEntry.__table__
+        posts = Post.__table__
+        follows = Follow.__table__
+        recent = db.select([posts.c.time, posts.c.id]) \
+            .where(posts.c.author_id == author_id) \
+            .order_by(posts.c.time.desc()) \
+            .limit(current_app.config['SOCIAL_BLOG_FANOUT_BACKFILL']) \
+            .alias('recent')
+        existing = db.exists() \
+            .where(timelines.c.user_id == follows.c.follower_id) \
+            .where(timelines.c.post_id == recent.c.id)
+        connection.execute(timelines.insert().from_select(
+            ['user_id', 'time', 'post_id'],
+            db.select([follows.c.follower_id, recent.c.time, recent.c.id])
+            .where(follows.c.followed_id == author_id)
+            .where(~existing)))
+
+    @staticmethod
+    def forget(user, followed):
+        timelines = TimelineEntry.__table__
+        posts = Post.__table__
+        db.session.execute(timelines.delete()
+                           .where(timelines.c.user_id == user.id)
+                           .where(timelines.c.post_id.in_(
+                               db.select([posts.c.id]).where(posts.c.author_id == followed.id))))
+
+
+class ReplicaHeartbeat(db.Model):
+    """A single row the primary stamps on every replica health check.
+
+    Replication copies it like any other write, so comparing the stamps on
+    both sides measures lag whether or not anyone has posted lately.
+    """
+    __tablename__ = 'replica_heartbeat'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    time = db.Column(db.DateTime, nullable=False)
+
+    @staticmethod
+    def read(connection):
+        table = ReplicaHeartbeat.__table__
+        return connection.scalar(db.select([table.c.time]).where(table.c.id == 1))
+
+    @staticmethod
+    def beat(connection, now=None):
+        table = ReplicaHeartbeat.__table__
+        now = now or datetime.utcnow()
+        if not connection.execute(table.update().where(table.c.id == 1)
+                                  .values(time=now)).rowcount:
+            connection.execute(table.insert(), id=1, time=now)
+        return now
+
+
+def _track_cached_changes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Role):
+            session.info['roles_changed'] = True
+        elif isinstance(obj, User):
+            session.info.setdefault('stale_users', set()).add(obj.id)
+        elif isinstance(obj, Post):
+            session.info.setdefault('stale_feeds', set()).add(obj.author_id)
+            if obj not in session.new:
+                session.info.setdefault('stale_posts', set()).add(obj.id)
+
+
+def _invalidate_caches(session):
+    if session.info.pop('roles_changed', False):
+        role_cache.invalidate()
+    fragment_cache.delete_posts(session.info.pop('stale_posts', None))
+    fragment_cache.delete_feeds(session.info.pop('stale_feeds', None))
+    for user_id in session.info.pop('stale_users', ()):
+        identity_cache.invalidate(user_id)
+
+
+def _forget_cached_changes(session):
+    session.info.pop('roles_changed', None)
+    session.info.pop('stale_posts', None)
+    session.info.pop('stale_feeds', None)
+    session.info.pop('stale_users', None)
+
+
+db.event.listen(db.session, 'after_flush', _track_cached_changes)
+db.event.listen(db.session, 'after_commit', _invalidate_caches)
+db.event.listen(db.session, 'after_rollback', _forget_cached_changes)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_cache.load(int(user_id))
 
 
 class AnonymousUser(AnonymousUserMixin):
@@ -0,0 +1,106 @@
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(time, id):
+    raw = f'{time.isoformat()}|{id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        time, id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(time), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPage:
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _post_key(post):
+    return post.time, post.id
+
+
+def _make_page(items, has_next, has_prev, key):
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = encode_cursor(*key(items[-1]))
+        if has_prev:
+            prev_cursor = encode_cursor(*key(items[0]))
+    return KeysetPage(items, next_cursor, prev_cursor)
+
+
+def keyset_paginate(query, time_column, id_column, after=None, before=None,
+                    per_page=20, key=_post_key):
+    """Return one newest-first page of ``query`` ordered by (time, id).
+
+    ``after`` continues towards older rows, ``before`` goes back towards
+    newer ones. Both are cursors produced by :func:`encode_cursor`.
+    """
+    if before is not None:
+        time, id = decode_cursor(before)
+        rows = query.filter(or_(time_column > time,
+                                and_(time_column == time, id_column > id))) \
+            .order_by(time_column.asc(), id_column.asc()) \
+            .limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after is not None:
+            time, id = decode_cursor(after)
+            query = query.filter(or_(time_column < time,
+                                     and_(time_column == time, id_column < id)))
+        rows = query.order_by(time_column.desc(), id_column.desc()) \
+            .limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_next = len(rows) > per_page
+        has_prev = after is not None
+    return _make_page(items, has_next, has_prev, key)
+
+
+def merge_keyset_pages(pages, per_page=20, before=None, key=_post_key):
+    """Merge pages fetched with the same cursor from several sources."""
+    merged = {}
+    for page in pages:
+        for item in page.items:
+            merged[key(item)] = item
+    items = [merged[k] for k in sorted(merged, reverse=True)]
+    if before is not None:
+        has_prev = len(items) > per_page or any(page.has_prev for page in pages)
+        items = items[-per_page:]
+        has_next = True
+    else:
+        has_next = len(items) > per_page or any(page.has_next for page in pages)
+        items = items[:per_page]
+        has_prev = any(page.has_prev for page in pages)
+    return _make_page(items, has_next, has_prev, key)
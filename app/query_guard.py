@@ -0,0 +1,76 @@
+import time
+
+from flask import g, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class TooManyQueries(RuntimeError):
+    pass
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g._sql_query_count = g.get('_sql_query_count', 0) + 1
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if started and has_app_context():
+        g._sql_query_time = g.get('_sql_query_time', 0.0) + time.perf_counter() - started.pop()
+
+
+def _abandon_query(context):
+    started = context.connection.info.get('_query_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+def query_count(globals_=None):
+    return (g if globals_ is None else globals_).get('_sql_query_count', 0)
+
+
+def query_time(globals_=None):
+    return (g if globals_ is None else globals_).get('_sql_query_time', 0.0)
+
+
+class QueryGuard:
+    """Watch the SQL issued while a template renders.
+
+    Anything the template runs is a lazy load (or a dynamic relationship
+    query) that the view should have loaded up front. Past
+    ``SOCIAL_BLOG_TEMPLATE_QUERY_LIMIT`` statements the render is logged,
+    or fails with :class:`TooManyQueries` when
+    ``SOCIAL_BLOG_TEMPLATE_QUERY_STRICT`` is set.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_TEMPLATE_QUERY_LIMIT', None)
+        app.config.setdefault('SOCIAL_BLOG_TEMPLATE_QUERY_STRICT', False)
+        if not event.contains(Engine, 'before_cursor_execute', _start_query):
+            event.listen(Engine, 'before_cursor_execute', _start_query)
+            event.listen(Engine, 'after_cursor_execute', _finish_query)
+            event.listen(Engine, 'handle_error', _abandon_query)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def _before_render(self, app, template, context, **extra):
+        g.setdefault('_template_query_marks', []).append(query_count())
+
+    def _after_render(self, app, template, context, **extra):
+        marks = g.get('_template_query_marks')
+        if not marks:
+            return
+        issued = query_count() - marks.pop()
+        limit = app.config['SOCIAL_BLOG_TEMPLATE_QUERY_LIMIT']
+        if limit is None or issued <= limit:
+            return
+        message = f'Template {template.name} issued {issued} queries (limit {limit})'
+        if app.config['SOCIAL_BLOG_TEMPLATE_QUERY_STRICT']:
+            raise TooManyQueries(message)
+        app.logger.warning(message)
@@ -0,0 +1,156 @@
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND = 'replica'
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+LAST_WRITE_KEY = '_last_write'
+
+
+def _is_write(clause):
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(('SELECT', 'WITH', 'EXPLAIN'))
+    return False
+
+
+def _mark_write():
+    if has_request_context():
+        g._replica_wrote = True
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends reads made during safe requests to the replica.
+
+    Flushes and DML statements always go to the primary, and once a
+    request has written everything else it reads does too.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or _is_write(clause):
+            _mark_write()
+        elif _bind_key(mapper) is None and _read_from_replica(self.app):
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _bind_key(mapper):
+    if mapper is None:
+        return None
+    return getattr(mapper.persist_selectable, 'info', {}).get('bind_key')
+
+
+def _read_from_replica(app):
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or ()):
+        return False
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return False
+    if g.get('_replica_wrote') or g.get('_replica_use_primary'):
+        return False
+    last_write = session.get(LAST_WRITE_KEY)
+    if last_write is not None and \
+            time.time() - last_write < app.config['SOCIAL_BLOG_REPLICA_MAX_LAG']:
+        return False
+    from app import replica
+    return replica.is_healthy(app)
+
+
+def use_primary(f):
+    """Read from the primary for the whole view, e.g. for GET views that write."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._replica_use_primary = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+class ReplicaRouter:
+    """Route read-only requests to the ``replica`` bind.
+
+    The replica is used when ``SQLALCHEMY_BINDS`` has a ``'replica'``
+    entry. Requests that wrote set a session timestamp so the same client
+    keeps reading from the primary for ``SOCIAL_BLOG_REPLICA_MAX_LAG``
+    seconds. Every ``SOCIAL_BLOG_REPLICA_CHECK_INTERVAL`` seconds the age of
+    the replica's copy of the heartbeat row is checked, and a replica
+    lagging by more than the maximum lag, or failing to answer, is
+    bypassed until the next check. Each check also stamps a fresh heartbeat
+    on the primary, so the interval must be shorter than the maximum lag:
+    a replica in sync then never holds a stamp older than the interval.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOCIAL_BLOG_REPLICA_MAX_LAG', 5)
+        app.config.setdefault('SOCIAL_BLOG_REPLICA_CHECK_INTERVAL', 1)
+        if app.config['SOCIAL_BLOG_REPLICA_CHECK_INTERVAL'] >= \
+                app.config['SOCIAL_BLOG_REPLICA_MAX_LAG']:
+            raise ValueError('SOCIAL_BLOG_REPLICA_CHECK_INTERVAL must be shorter than '
+                             'SOCIAL_BLOG_REPLICA_MAX_LAG')
+        app.extensions['replica'] = {'healthy': True, 'checked': None,
+                                     'lock': threading.Lock()}
+        app.after_request(self._remember_write)
+
+    def _remember_write(self, response):
+        if g.get('_replica_wrote'):
+            session[LAST_WRITE_KEY] = time.time()
+        return response
+
+    def is_healthy(self, app=None):
+        app = app or current_app
+        state = app.extensions['replica']
+        now = time.monotonic()
+        with state['lock']:
+            checked = state['checked']
+            if checked is not None and \
+                    now - checked < app.config['SOCIAL_BLOG_REPLICA_CHECK_INTERVAL']:
+                return state['healthy']
+            state['checked'] = now
+        try:
+            healthy = self.lag(app) <= app.config['SOCIAL_BLOG_REPLICA_MAX_LAG']
+        except Exception:
+            app.logger.exception('Replica lag check failed')
+            healthy = False
+        state['healthy'] = healthy
+        try:
+            self.beat(app)
+        except Exception:
+            app.logger.exception('Replica heartbeat failed')
+        return healthy
+
+    def beat(self, app=None):
+        """Stamp the heartbeat row on the primary."""
+        from app import db
+        from app.models import ReplicaHeartbeat
+
+        with db.get_engine(app or current_app).begin() as connection:
+            return ReplicaHeartbeat.beat(connection)
+
+    def lag(self, app=None):
+        """Age in seconds of the newest heartbeat the replica has applied:
+        an upper bound on its lag, off by at most the check interval."""
+        from app import db
+        from app.models import ReplicaHeartbeat
+
+        app = app or current_app
+        with db.get_engine(app, bind=REPLICA_BIND).connect() as connection:
+            secondary = ReplicaHeartbeat.read(connection)
+        if secondary is None:
+            return float('inf')
+        return max((datetime.utcnow() - secondary).total_seconds(), 0.0)
@@ -0,0 +1,83 @@
+from sqlalchemy import DDL, event, text
+
+from app import db
+
+FTS_TABLE = 'posts_fts'
+
+_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    f"USING fts5(body, content='posts', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF body ON posts BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); "
+    f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END",
+]
+
+_DROP = [f'DROP TABLE IF EXISTS {FTS_TABLE}']
+
+
+def install(table):
+    """Keep an FTS5 index of ``table`` in sync through SQLite triggers.
+
+    Triggers rather than ORM events also cover Core bulk writes such as
+    the body_html backfill and imports.
+    """
+    for statement in _CREATE:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in _DROP:
+        event.listen(table, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def is_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_index():
+    for statement in _CREATE:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def match_expression(terms):
+    tokens = terms.split()
+    return ' '.join('"' + token.replace('"', '""') + '"' for token in tokens)
+
+
+def search_post_ids(terms, page=1, per_page=20, include_disabled=False):
+    """Return (ids, has_next) for one page of posts ranked by bm25."""
+    expression = match_expression(terms)
+    if not expression:
+        return [], False
+    hidden = '' if include_disabled else \
+        f'AND NOT EXISTS (SELECT 1 FROM posts WHERE posts.id = {FTS_TABLE}.rowid ' \
+        f'AND posts.disabled) '
+    rows = db.session.execute(
+        text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression '
+             f'{hidden}ORDER BY bm25({FTS_TABLE}) LIMIT :limit OFFSET :offset'),
+        {'expression': expression, 'limit': per_page + 1,
+         'offset': (page - 1) * per_page}).fetchall()
+    ids = [row[0] for row in rows]
+    return ids[:per_page], len(ids) > per_page
+
+
+def rebuild_index(batch_size=1000):
+    ensure_index()
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+    db.session.commit()
+    last_id, done = 0, 0
+    while True:
+        ids = [row[0] for row in db.session.execute(
+            text('SELECT id FROM posts WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': batch_size})]
+        if not ids:
+            return done
+        db.session.execute(
+            text(f'INSERT INTO {FTS_TABLE}(rowid, body) '
+                 f'SELECT id, body FROM posts WHERE id BETWEEN :first AND :last'),
+            {'first': ids[0], 'last': ids[-1]})
+        db.session.commit()
+        last_id = ids[-1]
+        done += len(ids)
@@ -0,0 +1,27 @@
+import sqlite3
+
+from sqlalchemy import event
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def install(app, db):
+    """Apply ``SOCIAL_BLOG_SQLITE_PRAGMAS`` to every new SQLite connection."""
+    pragmas = app.config.get('SOCIAL_BLOG_SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    binds = [None] + list(app.config.get('SQLALCHEMY_BINDS') or ())
+    with app.app_context():
+        for bind in binds:
+            engine = db.get_engine(app, bind=bind)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _pragma_setter(pragmas))
@@ -0,0 +1,22 @@
+from flask import current_app, before_render_template, template_rendered
+from jinja2.environment import TemplateStream
+
+
+def _generate(app, template, context):
+    before_render_template.send(app, template=template, context=context)
+    yield from template.generate(context)
+    template_rendered.send(app, template=template, context=context)
+
+
+def stream_template(template_name, **context):
+    """Render a template as a stream of ``SOCIAL_BLOG_STREAM_BUFFER`` sized chunks.
+
+    Wrap the result in ``stream_with_context`` so the template can still
+    reach the request, the session and lazily iterated queries.
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = TemplateStream(_generate(app, template, context))
+    stream.enable_buffering(app.config.get('SOCIAL_BLOG_STREAM_BUFFER', 5))
+    return stream
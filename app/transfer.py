@@ -0,0 +1,191 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+from datetime import datetime
+
+from app import db
+from app.models import Role, User, Post, ArchivedPost, TimelineEntry
+
+TABLES = (Role.__table__, User.__table__, Post.__table__, ArchivedPost.__table__)
+ARCHIVES = {Post.__tablename__: (ArchivedPost.__table__,)}
+FORMATS = ('ndjson', 'csv')
+CHECKPOINT = 'checkpoint.json'
+
+
+def _path(directory, table, fmt):
+    return os.path.join(directory, f'{table.name}.{"jsonl" if fmt == "ndjson" else "csv"}')
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse(column, value):
+    if value is None or value == '':
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if python_type is bool:
+        return value if isinstance(value, bool) else value.lower() in ('1', 'true', 'yes')
+    if python_type is int:
+        return int(value)
+    return value
+
+
+def _rows(table, batch_size):
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select([table])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_id = rows[-1]['id']
+
+
+def export_data(directory, fmt='ndjson', batch_size=1000):
+    """Stream roles, users and posts, live and archived, to one file per table."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table in TABLES:
+        names = [column.name for column in table.columns]
+        count = 0
+        with open(_path(directory, table, fmt), 'w', newline='') as f:
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(names)
+            for row in _rows(table, batch_size):
+                values = [_dump(row[name]) for name in names]
+                if fmt == 'csv':
+                    writer.writerow(['' if value is None else value for value in values])
+                else:
+                    f.write(json.dumps(dict(zip(names, values))) + '\n')
+                count += 1
+        counts[table.name] = count
+    return counts
+
+
+def _read(path, fmt):
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _prepare(table, record):
+    row = {column.name: _parse(column, record.get(column.name)) for column in table.columns}
+    for column in table.columns:
+        # Exports made before a column existed leave it out; a null that was
+        # exported is kept.
+        if column.name not in record and column.default is not None \
+                and column.default.is_scalar:
+            row[column.name] = column.default.arg
+    if table is User.__table__ and row['avatar_hash'] is None and row['email']:
+        row['avatar_hash'] = hashlib.md5(row['email'].encode('utf-8')).hexdigest()
+    if table in (Post.__table__, ArchivedPost.__table__) and row['body_html'] is None:
+        row['body_html'] = Post.render_body(row['body'])
+    return row
+
+
+def _new_rows(table, rows):
+    """Drop the rows whose id is already in ``table``, so replaying a batch
+    after an interruption works on every dialect."""
+    existing = {row[0] for row in db.session.execute(
+        db.select([table.c.id]).where(table.c.id.in_([row['id'] for row in rows])))}
+    return [row for row in rows if row['id'] not in existing]
+
+
+def _sequence_reset(table):
+    return db.text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), :top)")
+
+
+def _sqlite_sequence_reset(table):
+    return [db.text(f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table.name}', 0 "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence "
+                    f"WHERE name = '{table.name}')"),
+            db.text(f"UPDATE sqlite_sequence SET seq = MAX(seq, :top) "
+                    f"WHERE name = '{table.name}'")]
+
+
+def _reset_sequence(table):
+    """Move the id sequence of ``table`` past every imported id, including
+    those of its archive, which must never be handed out again."""
+    if table.c.id.autoincrement is False:
+        return
+    top = max(db.session.scalar(db.select([db.func.coalesce(db.func.max(source.c.id), 1)]))
+              for source in (table,) + ARCHIVES.get(table.name, ()))
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(_sequence_reset(table), {'top': top})
+    elif dialect == 'sqlite' and table.dialect_options['sqlite']['autoincrement']:
+        for statement in _sqlite_sequence_reset(table):
+            db.session.execute(statement, {'top': top})
+    db.session.commit()
+
+
+def _load_checkpoint(directory):
+    try:
+        with open(os.path.join(directory, CHECKPOINT)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_checkpoint(directory, checkpoint):
+    path = os.path.join(directory, CHECKPOINT)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+
+def import_data(directory, fmt='ndjson', batch_size=1000, resume=True):
+    """Load the files written by :func:`export_data` with executemany batches.
+
+    Progress is checkpointed after every committed batch, so an
+    interrupted import resumes where it stopped. Rows whose primary key
+    already exists are skipped, which also makes replaying the last batch
+    harmless. Once every table is in, the id sequences are moved past the
+    imported ids, archived ones included.
+    """
+    checkpoint = _load_checkpoint(directory) if resume else {}
+    counts = {}
+    for table in TABLES:
+        path = _path(directory, table, fmt)
+        if not os.path.exists(path):
+            continue
+        done = checkpoint.get(table.name, 0)
+        records = itertools.islice(_read(path, fmt), done, None)
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            batch = _new_rows(table, [_prepare(table, record) for record in chunk])
+            if batch:
+                db.session.execute(table.insert(), batch)
+            db.session.commit()
+            done += len(chunk)
+            checkpoint[table.name] = done
+            _save_checkpoint(directory, checkpoint)
+        counts[table.name] = done
+    for table in TABLES:
+        if table.name in counts:
+            _reset_sequence(table)
+
+    User.reconcile_counters(batch_size)
+    TimelineEntry.rebuild()
+    checkpoint_path = os.path.join(directory, CHECKPOINT)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return counts
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Compare notification throughput of the digest job with per-event email.
+
+Seeds users and a synthetic notification outbox into a scratch SQLite
+database, then delivers it twice through a fake SMTP transport that
+sleeps ``--connect-ms`` per connection and ``--send-ms`` per message:
+once as one ``send_email`` per event through the mail queue, once with
+``send_digests``. Reports events per second, messages, connections and
+peak Python memory for each path.
+
+    python benchmarks/digest.py --events 20000 --users 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, fake, mail_queue  # noqa: E402
+from app.digest import send_digests  # noqa: E402
+from app.email import send_email  # noqa: E402
+from app.models import User, Notification  # noqa: E402
+
+
+class SlowTransport:
+    """Stands in for ``mail.connect`` with fixed connection and send costs."""
+
+    def __init__(self, connect_seconds, send_seconds):
+        self.connect_seconds = connect_seconds
+        self.send_seconds = send_seconds
+        self.connections = 0
+        self.messages = 0
+
+    def __call__(self, app):
+        return self
+
+    def __enter__(self):
+        time.sleep(self.connect_seconds)
+        self.connections += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        time.sleep(self.send_seconds)
+        self.messages += 1
+
+
+def fill_outbox(events, random_seed):
+    rng = random.Random(random_seed)
+    user_ids = [row[0] for row in db.session.query(User.id)]
+    start = datetime.utcnow() - timedelta(hours=1)
+    rows = [{'recipient_id': rng.choice(user_ids), 'kind': 'follow',
+             'actor_id': rng.choice(user_ids), 'time': start + timedelta(milliseconds=i)}
+            for i in range(events)]
+    db.session.execute(Notification.__table__.insert(), rows)
+    db.session.commit()
+
+
+def per_event(app):
+    notifications = Notification.__table__
+    users = User.__table__
+    actors = users.alias()
+    query = db.select([users.c.username, users.c.email, notifications.c.kind,
+                       actors.c.username, notifications.c.time]) \
+        .select_from(notifications
+                     .join(users, users.c.id == notifications.c.recipient_id)
+                     .join(actors, actors.c.id == notifications.c.actor_id))
+    with app.test_request_context(base_url=app.config['SOCIAL_BLOG_BASE_URL']):
+        for username, email, kind, actor, time_ in db.session.execute(query):
+            item = {'kind': kind, 'actor': actor, 'post_id': None, 'comment_id': None,
+                    'time': time_}
+            send_email(email, 'New notification', 'mail/digest',
+                       username=username, items=[item], total=1, more=0)
+        mail_queue.flush()
+
+
+def measure(label, events, transport, deliver):
+    tracemalloc.start()
+    started = time.perf_counter()
+    deliver()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{label:>9}: {events / elapsed:9.1f} events/s  {transport.messages:6d} messages  '
+          f'{transport.connections:5d} connections  {peak / 1024 / 1024:6.1f} MiB peak')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--connect-ms', type=float, default=20.0)
+    parser.add_argument('--send-ms', type=float, default=1.0)
+    parser.add_argument('--random-seed', type=int, default=1)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path,
+                      SOCIAL_BLOG_MAIL_QUEUE_SIZE=args.events,
+                      SOCIAL_BLOG_TEMPLATE_QUERY_STRICT=False)
+    mail_queue.init_app(app)
+    try:
+        with app.app_context():
+            db.create_all()
+            fake.seed(users=args.users, posts=0, follows=0, random_seed=args.random_seed)
+            for label, deliver in (('per-event', lambda: per_event(app)),
+                                   ('digest', lambda: send_digests(args.batch_size))):
+                fill_outbox(args.events, args.random_seed)
+                transport = SlowTransport(args.connect_ms / 1000, args.send_ms / 1000)
+                mail_queue.connect = transport
+                measure(label, args.events, transport, deliver)
+                db.session.execute(Notification.__table__.delete())
+                db.session.commit()
+            mail_queue.shutdown(app)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
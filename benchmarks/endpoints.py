@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""Load benchmark for the blog's hot endpoints.
+
+Seeds a synthetic dataset into a scratch SQLite database, drives the
+index, a busy profile page, the JSON API equivalents of both, login and
+post creation through the Flask test client, and reports p50/p95/p99
+latency, throughput, SQL queries and response bytes per request. Results are written as JSON; ``--compare`` checks them
+against an earlier run and exits non-zero on a p95 regression.
+
+    python benchmarks/endpoints.py --output before.json
+    python benchmarks/endpoints.py --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, fake, metrics  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def recorded_queries(app):
+    state = app.extensions['metrics']
+    with state['lock']:
+        return sum(stats.sql_queries for stats in state['endpoints'].values())
+
+
+def measure(app, client, requests, make_request):
+    """Time each request until its body has been read and the response
+    closed, so streamed pages count in full; queries come from the metrics
+    totals, which streamed responses only reach once closed."""
+    latencies, queries, sizes = [], [], []
+    started = time.perf_counter()
+    for i in range(requests):
+        recorded = recorded_queries(app)
+        before = time.perf_counter()
+        response = make_request(client, i)
+        data = response.get_data()
+        response.close()
+        latencies.append(time.perf_counter() - before)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code} from {response.request.path}')
+        queries.append(recorded_queries(app) - recorded)
+        sizes.append(len(data))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'throughput': requests / elapsed,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries_per_request': statistics.mean(queries),
+        'bytes_per_request': statistics.mean(sizes),
+    }
+
+
+def login(client, email, password='password'):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+
+def run(args):
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path,
+                      SOCIAL_BLOG_METRICS=True,
+                      SOCIAL_BLOG_METRICS_HEADERS=True,
+                      SOCIAL_BLOG_TEMPLATE_QUERY_STRICT=False)
+    metrics.init_app(app)
+    try:
+        with app.app_context():
+            db.create_all()
+            fake.seed(users=args.users, posts=args.posts, follows=args.follows,
+                      random_seed=args.random_seed)
+            busiest = User.query.order_by(User.posts_count.desc()).first()
+            busiest_name, busiest_email = busiest.username, busiest.email
+            db.session.remove()
+
+        anonymous = app.test_client()
+        author = app.test_client()
+        login(author, busiest_email)
+
+        scenarios = {
+            'index': lambda c, i: c.get('/index'),
+            'profile': lambda c, i: c.get(f'/auth/user/{busiest_name}'),
+            'api_posts': lambda c, i: c.get('/api/v1/posts/'),
+            'api_profile': lambda c, i: c.get(f'/api/v1/users/{busiest_name}/posts/?limit=100'),
+            'login': lambda c, i: login(c, busiest_email),
+            'create_post': lambda c, i: c.post('/index', data={'body': f'benchmark post {i}'}),
+        }
+        clients = {'index': anonymous, 'profile': anonymous,
+                   'api_posts': anonymous, 'api_profile': anonymous,
+                   'login': app.test_client(), 'create_post': author}
+        results = {}
+        for name, make_request in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            for i in range(args.warmup):
+                make_request(clients[name], i).close()
+            results[name] = measure(app, clients[name], args.requests, make_request)
+        return {'dataset': {'users': args.users, 'posts': args.posts, 'follows': args.follows},
+                'results': results}
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(path)
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        change = result['p95_ms'] / previous['p95_ms'] - 1
+        print(f'{name:>12}: p95 {previous["p95_ms"]:.2f}ms -> {result["p95_ms"]:.2f}ms '
+              f'({change:+.0%}), queries {previous["queries_per_request"]:.1f} -> '
+              f'{result["queries_per_request"]:.1f}')
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--only', nargs='*', help='scenarios to run')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative p95 slowdown when comparing')
+    args = parser.parse_args()
+
+    current = run(args)
+    for name, result in current['results'].items():
+        print(f'{name:>12}: p50 {result["p50_ms"]:7.2f}ms  p95 {result["p95_ms"]:7.2f}ms  '
+              f'p99 {result["p99_ms"]:7.2f}ms  {result["throughput"]:8.1f} req/s  '
+              f'{result["queries_per_request"]:5.1f} queries/req  '
+              f'{result["bytes_per_request"] / 1024:7.1f} KiB/req')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(current, json.load(f), args.tolerance)
+        if regressions:
+            print('p95 regressions: ' + ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Compare login verification throughput with and without the hash pool.
+
+Each run verifies passwords from ``--threads`` request threads for
+``--seconds`` and reports logins per second, overall and per core.
+
+    python benchmarks/password_hashing.py --threads 8 --workers 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, password_hasher  # noqa: E402
+
+
+def run(app, threads, seconds, password_hash):
+    done = [0] * threads
+    deadline = time.monotonic() + seconds
+
+    def login(slot):
+        with app.app_context():
+            while time.monotonic() < deadline:
+                password_hasher.verify(password_hash, 'correct horse')
+                done[slot] += 1
+
+    workers = [threading.Thread(target=login, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(done) / (time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    cores = os.cpu_count() or 1
+    with app.app_context():
+        password_hash = password_hasher.hash('correct horse')
+
+    for label, workers in (('inline', 0), (f'pool({args.workers})', args.workers)):
+        app.config['SOCIAL_BLOG_HASH_WORKERS'] = workers
+        if workers:
+            with app.app_context():
+                password_hasher.verify(password_hash, 'warm up')
+        rate = run(app, args.threads, args.seconds, password_hash)
+        print(f'{label:>10}: {rate:8.1f} logins/s  {rate / cores:8.1f} logins/s/core')
+    password_hasher.shutdown(app)
+
+
+if __name__ == '__main__':
+    main()
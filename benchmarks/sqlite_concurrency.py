@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Read throughput under a concurrent write load, per database profile.
+
+Runs the same workload against the development profile (default engine,
+rollback journal) and the production profile (QueuePool, WAL and the
+SOCIAL_BLOG_SQLITE_PRAGMAS): ``--readers`` threads page through the index
+timeline while one writer keeps inserting posts and touching last_seen.
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --seconds 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+directory = tempfile.mkdtemp()
+os.environ['DEV_DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'development.sqlite')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'production.sqlite')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import create_app, db, fake  # noqa: E402
+from app.models import Post, User  # noqa: E402
+from app.pagination import keyset_paginate  # noqa: E402
+
+
+def run(config_name, args):
+    app = create_app(config_name)
+    with app.app_context():
+        db.create_all()
+        user_ids = fake.seed(users=args.users, posts=args.posts, follows=0, random_seed=1)
+        db.session.remove()
+
+    deadline = time.monotonic() + args.seconds
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        with app.app_context():
+            while time.monotonic() < deadline:
+                try:
+                    page = keyset_paginate(Post.query.options(db.joinedload(Post.author)),
+                                           Post.time, Post.id, per_page=20)
+                    [post.author.username for post in page]
+                    bump('reads')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('errors')
+                finally:
+                    db.session.remove()
+
+    def writer():
+        with app.app_context():
+            i = 0
+            while time.monotonic() < deadline:
+                user_id = user_ids[i % len(user_ids)]
+                try:
+                    db.session.add(Post(body=f'write load {i}', author_id=user_id))
+                    User.query.filter_by(id=user_id).update({'last_seen': datetime.utcnow()})
+                    db.session.commit()
+                    bump('writes')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('errors')
+                finally:
+                    db.session.remove()
+                i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        db.engine.dispose()
+    return {key: value / args.seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=5000)
+    args = parser.parse_args()
+    try:
+        for config_name in ('development', 'production'):
+            result = run(config_name, args)
+            print(f'{config_name:>12}: {result["reads"]:8.1f} reads/s  '
+                  f'{result["writes"]:7.1f} writes/s  {result["errors"]:6.1f} errors/s')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 import os
 
+from sqlalchemy.pool import QueuePool
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -20,6 +22,43 @@ class Config:
     SOCIAL_BLOG_MAIL_SUBJECT_PREFIX = 'SocialBlog'
     SOCIAL_BLOG_MAIL_SENDER = 'Social blog Admin b000ks.in.st0re@gmail.com'
     SOCIAL_BLOG_ADMIN = os.environ.get('SOCIAL_BLOG_ADMIN')
+    SOCIAL_BLOG_POSTS_PER_PAGE = 20
+    SOCIAL_BLOG_COMMENTS_PER_PAGE = 50
+    SOCIAL_BLOG_FANOUT_CUTOFF = 1000
+    SOCIAL_BLOG_FANOUT_BACKFILL = 100
+    SOCIAL_BLOG_TEMPLATE_QUERY_LIMIT = 10
+    SOCIAL_BLOG_TEMPLATE_QUERY_STRICT = False
+    SOCIAL_BLOG_LAST_SEEN_GRANULARITY = 60
+    SOCIAL_BLOG_LAST_SEEN_FLUSH_INTERVAL = 30
+    SOCIAL_BLOG_MAIL_WORKERS = 2
+    SOCIAL_BLOG_MAIL_QUEUE_SIZE = 1000
+    SOCIAL_BLOG_MAIL_BATCH_SIZE = 20
+    SOCIAL_BLOG_MAIL_ENQUEUE_TIMEOUT = 5
+    SOCIAL_BLOG_MAIL_RETRIES = 3
+    SOCIAL_BLOG_MAIL_RETRY_BACKOFF = 1.0
+    SOCIAL_BLOG_DIGEST_MAX_ITEMS = 20
+    SOCIAL_BLOG_BASE_URL = os.environ.get('SOCIAL_BLOG_BASE_URL', 'http://localhost:5000')
+    SOCIAL_BLOG_ROLE_CACHE_TTL = 300
+    SOCIAL_BLOG_IDENTITY_CACHE_TTL = 30
+    SOCIAL_BLOG_FRAGMENT_CACHE = os.environ.get('SOCIAL_BLOG_FRAGMENT_CACHE', 'lru')
+    SOCIAL_BLOG_FRAGMENT_CACHE_SIZE = 2048
+    SOCIAL_BLOG_FRAGMENT_CACHE_PATH = os.path.join(basedir, 'fragments.sqlite')
+    SOCIAL_BLOG_PASSWORD_METHOD = 'pbkdf2:sha256:150000'
+    SOCIAL_BLOG_PASSWORD_SALT_LENGTH = 16
+    SOCIAL_BLOG_HASH_WORKERS = int(os.environ.get('SOCIAL_BLOG_HASH_WORKERS', os.cpu_count() or 1))
+    SOCIAL_BLOG_REPLICA_MAX_LAG = 5
+    SOCIAL_BLOG_HTTP_MAX_AGE = 0
+    SOCIAL_BLOG_STREAM_PAGES = True
+    SOCIAL_BLOG_FEED_SIZE = 20
+    SOCIAL_BLOG_ARCHIVE_AFTER_DAYS = 365
+    SOCIAL_BLOG_API_MAX_PER_PAGE = 100
+    SOCIAL_BLOG_STREAM_BUFFER = 5
+    SOCIAL_BLOG_STREAM_YIELD_PER = 100
+    SOCIAL_BLOG_REPLICA_CHECK_INTERVAL = 1
+    SOCIAL_BLOG_METRICS = os.environ.get('SOCIAL_BLOG_METRICS', 'false').lower() in \
+        ['true', 'on', '1']
+    SOCIAL_BLOG_METRICS_HEADERS = os.environ.get('SOCIAL_BLOG_METRICS_HEADERS', 'false').lower() in \
+        ['true', 'on', '1']
 
     @staticmethod
     def init_app(app):
@@ -42,12 +81,49 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'testing secret key')
+    WTF_CSRF_ENABLED = False
+    SOCIAL_BLOG_TEMPLATE_QUERY_STRICT = True
+    MAIL_SUPPRESS_SEND = True
+    SOCIAL_BLOG_HASH_WORKERS = 0
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'data-test.sqlite')
 
 
+def engine_options(uri):
+    options = {
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', '10')),
+        'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', '20')),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+    if uri.startswith('sqlite'):
+        options['poolclass'] = QueuePool
+        options['connect_args'] = {'check_same_thread': False, 'timeout': 5}
+    return options
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        'sqlite:///' + os.path.join(basedir, 'data.sqlite')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    if os.environ.get('REPLICA_DATABASE_URL'):
+        SQLALCHEMY_BINDS = {'replica': os.environ['REPLICA_DATABASE_URL']}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SOCIAL_BLOG_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+        'temp_store': 'MEMORY',
+    }
+
+
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
+    'production': ProductionConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
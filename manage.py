@@ -1,24 +1,119 @@
 #!/usr/bin/env python
 import os
+from datetime import datetime, timedelta
 
-from flask_script import Manager, Shell
+from flask_script import Manager, Shell, Command, Option
 from flask_migrate import Migrate, MigrateCommand
 
-from app import create_app, db
-from app.models import Role, User
+from app import create_app, db, search, fake, transfer, digest
+from app.models import Role, User, Post
 
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
 manager = Manager(app)
-migrate = Migrate(app, db)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The FTS5 index and its shadow tables are created by triggers, not
+    # models, and SQLite keeps AUTOINCREMENT counters in sqlite_sequence.
+    return not (type_ == 'table' and (name.startswith(search.FTS_TABLE)
+                                      or name == 'sqlite_sequence'))
+
+
+migrate = Migrate(app, db, include_object=include_object)
 
 
 def make_shell_context():
-    return dict(app=app, db=db, User=User, Role=Role)
+    return dict(app=app, db=db, User=User, Role=Role, Post=Post)
 
 
 manager.add_command("shell", Shell(make_context=make_shell_context))
 manager.add_command('db', MigrateCommand)
 
+
+class ExportCommand(Command):
+    """Stream roles, users and posts to NDJSON or CSV files."""
+
+    option_list = (
+        Option('-d', '--directory', dest='directory', required=True),
+        Option('-f', '--format', dest='fmt', choices=transfer.FORMATS, default='ndjson'),
+        Option('-b', '--batch-size', dest='batch_size', type=int, default=1000),
+    )
+
+    def run(self, directory, fmt, batch_size):
+        for table, count in transfer.export_data(directory, fmt, batch_size).items():
+            print(f'Exported {count} {table}')
+
+
+class ImportCommand(Command):
+    """Load an export in batches, resuming from the last checkpoint."""
+
+    option_list = (
+        Option('-d', '--directory', dest='directory', required=True),
+        Option('-f', '--format', dest='fmt', choices=transfer.FORMATS, default='ndjson'),
+        Option('-b', '--batch-size', dest='batch_size', type=int, default=1000),
+        Option('--restart', dest='resume', action='store_false', default=True),
+    )
+
+    def run(self, directory, fmt, batch_size, resume):
+        for table, count in transfer.import_data(directory, fmt, batch_size, resume).items():
+            print(f'Imported {count} {table}')
+
+
+manager.add_command('export', ExportCommand())
+manager.add_command('import', ImportCommand())
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=500)
+def backfill_body_html(batch_size):
+    """Render body_html for posts written before it was stored."""
+    print(f'Rendered {Post.backfill_body_html(batch_size)} posts')
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000)
+def reconcile_counters(batch_size):
+    """Recompute the denormalized post and follow counters on users."""
+    print(f'Reconciled counters for {User.reconcile_counters(batch_size)} users')
+
+
+
+@manager.option('-d', '--days', dest='days', type=int, default=None)
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=500)
+def archive_posts(days, batch_size):
+    """Move posts older than SOCIAL_BLOG_ARCHIVE_AFTER_DAYS to the archive."""
+    days = days if days is not None else app.config['SOCIAL_BLOG_ARCHIVE_AFTER_DAYS']
+    moved = Post.archive(datetime.utcnow() - timedelta(days=days), batch_size)
+    print(f'Archived {moved} posts older than {days} days')
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000)
+def rebuild_search_index(batch_size):
+    """Rebuild the full-text index over post bodies in batches."""
+    print(f'Indexed {search.rebuild_index(batch_size)} posts')
+
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=100)
+@manager.option('--base-url', dest='base_url', default=None)
+def send_digests(batch_size, base_url):
+    """Email each user one digest of their pending notifications."""
+    stats = digest.send_digests(batch_size, base_url)
+    print(f"Sent {stats['digests']} digests covering {stats['events']} notifications "
+          f"over {stats['connections']} connections")
+
+
+@manager.option('-u', '--users', dest='users', type=int, default=100)
+@manager.option('-p', '--posts', dest='posts', type=int, default=1000)
+@manager.option('-f', '--follows', dest='follows', type=int, default=10)
+@manager.option('-s', '--skew', dest='skew', type=float, default=1.1)
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000)
+@manager.option('-r', '--random-seed', dest='random_seed', type=int, default=None)
+def seed(users, posts, follows, skew, batch_size, random_seed):
+    """Seed a synthetic dataset of users, posts and follows."""
+    fake.seed(users=users, posts=posts, follows=follows, skew=skew,
+              batch_size=batch_size, random_seed=random_seed)
+    print(f'Seeded {users} users and {posts} posts')
+
+
 if __name__ == '__main__':
     manager.run()
\ No newline at end of file
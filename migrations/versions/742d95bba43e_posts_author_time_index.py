@@ -0,0 +1,25 @@
+"""posts author time index
+
+Revision ID: 742d95bba43e
+Revises: bfe5c87a3e14
+Create Date: 2026-10-17 12:06:12.705405
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '742d95bba43e'
+down_revision = 'bfe5c87a3e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_posts_author_time', 'posts',
+                    ['author_id', sa.text('time DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_posts_author_time', table_name='posts')
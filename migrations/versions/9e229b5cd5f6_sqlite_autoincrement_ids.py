@@ -0,0 +1,57 @@
+"""sqlite autoincrement ids
+
+Revision ID: 9e229b5cd5f6
+Revises: aa1fce2c87a2
+Create Date: 2026-10-17 13:02:28.742960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e229b5cd5f6'
+down_revision = 'aa1fce2c87a2'
+branch_labels = None
+depends_on = None
+
+
+# Rebuilding posts drops its full-text triggers; they are put back after.
+FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF body ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO posts_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+
+ARCHIVES = {'posts': 'posts_archive', 'comments': 'comments_archive'}
+
+
+def _rebuild(autoincrement):
+    for table, archive in ARCHIVES.items():
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}):
+            pass
+        if autoincrement:
+            # Start past every id already used, including the archived ones.
+            op.execute(f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', 0 "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table}')")
+            op.execute(f"UPDATE sqlite_sequence SET seq = MAX(seq, "
+                       f"(SELECT COALESCE(MAX(id), 0) FROM {table}), "
+                       f"(SELECT COALESCE(MAX(id), 0) FROM {archive})) WHERE name = '{table}'")
+    for statement in FTS_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    # Other databases never reuse ids handed out by a sequence.
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild(True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild(False)
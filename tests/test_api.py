@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import User, Post, Role
+
+
+class APITestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_POSTS_PER_PAGE'] = 2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john', location='Paris')
+        self.susan = User(email='susan@example.com', username='susan')
+        db.session.add_all([self.john, self.susan])
+        for i in range(5):
+            db.session.add(Post(body=f'post {i}', author=(self.john, self.susan)[i % 2],
+                                time=datetime(2020, 1, 1) + timedelta(minutes=i)))
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_posts_cursor_pagination(self):
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([post['body'] for post in data['posts']], ['post 4', 'post 3'])
+        self.assertEqual(data['posts'][0]['author'], 'john')
+        self.assertEqual(data['posts'][0]['time'], '2020-01-01T00:04:00Z')
+        self.assertIsNone(data['prev'])
+        data = self.client.get(data['next']).get_json()
+        self.assertEqual([post['body'] for post in data['posts']], ['post 2', 'post 1'])
+        data = self.client.get(data['next']).get_json()
+        self.assertEqual([post['body'] for post in data['posts']], ['post 0'])
+        self.assertIsNone(data['next'])
+        data = self.client.get(data['prev']).get_json()
+        self.assertEqual([post['body'] for post in data['posts']], ['post 2', 'post 1'])
+
+    def test_sparse_fieldsets(self):
+        data = self.client.get('/api/v1/posts/?fields=id,body&limit=1').get_json()
+        self.assertEqual(set(data['posts'][0]), {'id', 'body'})
+        self.assertIn('fields=id%2Cbody', data['next'])
+        self.assertIn('limit=1', data['next'])
+        data = self.client.get('/api/v1/users/john?fields=username,location').get_json()
+        self.assertEqual(data, {'username': 'john', 'location': 'Paris'})
+
+        response = self.client.get('/api/v1/users/john?fields=email')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], 'unknown fields: email')
+
+    def test_user_posts(self):
+        data = self.client.get('/api/v1/users/susan/posts/?limit=10').get_json()
+        self.assertEqual([post['body'] for post in data['posts']], ['post 3', 'post 1'])
+        self.assertIsNone(data['next'])
+        data = self.client.get('/api/v1/users/john').get_json()
+        self.assertEqual(data['posts_count'], 3)
+        self.assertNotIn('email', data)
+
+    def test_single_post(self):
+        post = Post.query.filter_by(body='post 0').first()
+        data = self.client.get(f'/api/v1/posts/{post.id}?fields=body_html').get_json()
+        self.assertEqual(data, {'body_html': '<p>post 0</p>'})
+
+    def test_errors(self):
+        for url in ('/api/v1/users/nobody', '/api/v1/users/nobody/posts/', '/api/v1/posts/999'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.get_json(), {'error': 'not found'})
+        response = self.client.get('/api/v1/posts/?after=garbage')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'invalid cursor'})
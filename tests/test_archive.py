@@ -0,0 +1,149 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, last_seen, sqlite_tuning
+from app.models import User, Post, Role, ArchivedPost, ArchivedComment, Comment, \
+    Notification, TimelineEntry
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john', password='cat',
+                         confirmed=True)
+        self.susan = User(email='susan@example.com', username='susan', password='cat',
+                          confirmed=True)
+        db.session.add_all([self.john, self.susan])
+        db.session.commit()
+        self.susan.follow(self.john)
+        self.now = datetime.utcnow()
+        for i in range(10):
+            db.session.add(Post(body=f'post {i}', author=self.john,
+                                time=self.now - timedelta(days=10 - i)))
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def archive(self, days=3, batch_size=2):
+        return Post.archive(self.now - timedelta(days=days), batch_size)
+
+    def test_archive_moves_old_posts(self):
+        self.assertEqual(self.archive(), 7)
+        self.assertEqual(Post.query.count(), 3)
+        self.assertEqual(sorted(post.body for post in ArchivedPost.query),
+                         [f'post {i}' for i in range(7)])
+        self.assertEqual(TimelineEntry.query.filter_by(user_id=self.susan.id).count(), 3)
+        self.assertEqual(self.archive(), 0)
+        User.reconcile_counters()
+        self.assertEqual(User.query.get(self.john.id).posts_count, 10)
+
+    def test_archived_ids_are_not_reused(self):
+        self.assertEqual(self.archive(days=0), 10)
+        self.assertEqual(Post.query.count(), 0)
+        db.session.add(Post(body='new', author=self.john))
+        db.session.commit()
+        self.assertGreater(Post.query.filter_by(body='new').one().id,
+                           db.session.query(db.func.max(ArchivedPost.id)).scalar())
+
+    def test_archive_again_after_commenting(self):
+        post_id = self.comment_on_first_post()
+        Notification.query.delete()
+        db.session.commit()
+        self.assertEqual(self.archive(), 7)
+        post = Post.query.filter_by(body='post 9').one()
+        db.session.add(Comment(body='new comment', post=post, author=self.john))
+        db.session.commit()
+        comment_id, new_post_id = Comment.query.one().id, post.id
+        self.assertGreater(comment_id, db.session.query(db.func.max(ArchivedComment.id)).scalar())
+        self.assertEqual(self.archive(days=0), 3)
+        self.assertEqual(ArchivedComment.query.count(), 3)
+        self.assertEqual(ArchivedComment.query.get(comment_id).post_id, new_post_id)
+        self.assertEqual(ArchivedComment.query.filter_by(post_id=post_id).count(), 2)
+
+    def test_profile_shows_archive_on_request(self):
+        self.archive()
+        for stream in (True, False):
+            self.app.config['SOCIAL_BLOG_STREAM_PAGES'] = stream
+            data = self.client.get('/auth/user/john').get_data(as_text=True)
+            self.assertIn('post 9', data)
+            self.assertNotIn('post 6', data)
+            self.assertIn('Show archived posts', data)
+
+            data = self.client.get('/auth/user/john?archived=1').get_data(as_text=True)
+            bodies = [f'post {i}' for i in range(9, -1, -1)]
+            positions = [data.index(f'<p>{body}</p>') for body in bodies]
+            self.assertEqual(positions, sorted(positions))
+            self.assertNotIn('Show archived posts', data)
+
+        data = self.client.get('/auth/user/susan').get_data(as_text=True)
+        self.assertNotIn('Show archived posts', data)
+
+    def comment_on_first_post(self):
+        post = Post.query.filter_by(body='post 0').one()
+        comment = Comment(body='old comment', post=post, author=self.susan)
+        db.session.add(comment)
+        db.session.commit()
+        db.session.add(Comment(body='old reply', post=post, parent=comment, author=self.john))
+        db.session.commit()
+        return post.id
+
+    def test_comments_move_with_their_post(self):
+        post_id = self.comment_on_first_post()
+        Notification.query.delete()
+        db.session.commit()
+        self.assertEqual(self.archive(), 7)
+        self.assertEqual(Comment.query.count(), 0)
+        comments = ArchivedComment.query.order_by(ArchivedComment.path).all()
+        self.assertEqual([(c.body, c.post_id, c.depth) for c in comments],
+                         [('old comment', post_id, 0), ('old reply', post_id, 1)])
+
+    def test_notified_posts_wait_for_the_digest(self):
+        post_id = self.comment_on_first_post()
+        self.assertEqual(self.archive(), 6)
+        self.assertIsNotNone(Post.query.get(post_id))
+        self.assertEqual(Comment.query.count(), 2)
+        Notification.query.delete()
+        db.session.commit()
+        self.assertEqual(self.archive(), 1)
+        self.assertIsNone(Post.query.get(post_id))
+
+    def test_archive_keeps_foreign_keys_intact(self):
+        self.app.config['SOCIAL_BLOG_SQLITE_PRAGMAS'] = {'foreign_keys': 'ON'}
+        sqlite_tuning.install(self.app, db)
+        db.session.remove()
+        db.engine.dispose()
+        self.assertEqual(db.session.execute('PRAGMA foreign_keys').scalar(), 1)
+        self.comment_on_first_post()
+        self.assertEqual(self.archive(), 6)
+        Notification.query.delete()
+        db.session.commit()
+        self.assertEqual(self.archive(), 1)
+        self.assertEqual(db.session.execute('PRAGMA foreign_key_check').fetchall(), [])
+
+    def test_archived_post_page_is_read_only(self):
+        post_id = self.comment_on_first_post()
+        Notification.query.delete()
+        db.session.commit()
+        self.archive()
+        self.client.post('/auth/login', data={'email': 'susan@example.com', 'password': 'cat'})
+        response = self.client.get(f'/post/{post_id}')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_data(as_text=True)
+        self.assertIn('post 0', data)
+        self.assertIn('old comment', data)
+        self.assertIn('old reply', data)
+        self.assertNotIn('comment-form', data)
+        self.assertNotIn('reply_to', data)
+        self.client.post(f'/post/{post_id}', data={'body': 'late reply'})
+        self.assertEqual(Comment.query.count(), 0)
+        self.assertEqual(ArchivedComment.query.count(), 2)
+        self.assertEqual(self.client.get('/post/12345').status_code, 404)
@@ -1,7 +1,10 @@
 import unittest
 
 from flask import current_app
-from app import db, create_app
+from sqlalchemy.pool import QueuePool
+
+from app import db, create_app, sqlite_tuning
+from config import engine_options
 
 
 class BasicTest(unittest.TestCase):
@@ -20,4 +23,18 @@ class BasicTest(unittest.TestCase):
         self.assertFalse(current_app is None)
 
     def test_app_is_testing(self) -> None:
-        self.assertTrue(current_app.config['TESTING'])
\ No newline at end of file
+        self.assertTrue(current_app.config['TESTING'])
+
+    def test_sqlite_pragmas(self) -> None:
+        self.app.config['SOCIAL_BLOG_SQLITE_PRAGMAS'] = {'synchronous': 'OFF', 'cache_size': -1024}
+        sqlite_tuning.install(self.app, db)
+        db.session.remove()
+        self.assertEqual(db.session.execute('PRAGMA synchronous').scalar(), 0)
+        self.assertEqual(db.session.execute('PRAGMA cache_size').scalar(), -1024)
+
+    def test_production_engine_options(self) -> None:
+        options = engine_options('sqlite:///data.sqlite')
+        self.assertIs(options['poolclass'], QueuePool)
+        self.assertFalse(options['connect_args']['check_same_thread'])
+        self.assertTrue(engine_options('postgresql://db/blog')['pool_pre_ping'])
+        self.assertNotIn('poolclass', engine_options('postgresql://db/blog'))
@@ -0,0 +1,85 @@
+import unittest
+
+from app import create_app, db, identity_cache, last_seen
+from app.models import User, Role, Permissions, load_user
+from app.query_guard import query_count
+
+
+class AuthCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        user = User(email='john@example.com', username='john')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        db.session.remove()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_role_permissions_are_cached(self):
+        user = User.query.get(self.user_id)
+        self.assertTrue(user.can(Permissions.WRITE))
+        before = query_count()
+        self.assertTrue(user.can(Permissions.FOLLOW))
+        self.assertFalse(user.can(Permissions.ADMIN))
+        self.assertEqual(query_count(), before)
+
+    def test_role_change_invalidates_cache(self):
+        user = User.query.get(self.user_id)
+        self.assertTrue(user.can(Permissions.WRITE))
+        role = Role.query.filter_by(name='User').first()
+        role.remove_permission(Permissions.WRITE)
+        db.session.commit()
+        self.assertFalse(User.query.get(self.user_id).can(Permissions.WRITE))
+
+    def test_load_user_hits_identity_cache(self):
+        self.assertTrue(load_user(str(self.user_id)).can(Permissions.WRITE))
+        db.session.remove()
+        before = query_count()
+        user = load_user(str(self.user_id))
+        self.assertEqual(user.username, 'john')
+        self.assertTrue(user.can(Permissions.WRITE))
+        self.assertEqual(query_count(), before)
+        self.assertIn(user, db.session)
+
+    def test_invalidate_reloads_user(self):
+        load_user(str(self.user_id))
+        db.session.remove()
+        User.query.get(self.user_id).name = 'John Smith'
+        db.session.commit()
+        identity_cache.invalidate(self.user_id)
+        db.session.remove()
+        self.assertEqual(load_user(str(self.user_id)).name, 'John Smith')
+
+    def test_counter_changes_invalidate_identity(self):
+        john = User.query.get(self.user_id)
+        john.password = 'cat'
+        john.confirmed = True
+        susan = User(email='susan@example.com', username='susan')
+        db.session.add(susan)
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        client.get('/auth/user/john')
+        for i in range(3):
+            client.post('/index', data={'body': f'post {i}'})
+        client.post('/auth/follow/susan')
+        data = client.get('/auth/user/john').get_data(as_text=True)
+        self.assertIn('3 blog posts.', data)
+        self.assertIn('Following: 1', data)
+
+    def test_orm_changes_invalidate_identity(self):
+        load_user(str(self.user_id))
+        db.session.remove()
+        User.query.get(self.user_id).name = 'John Smith'
+        db.session.commit()
+        db.session.remove()
+        self.assertEqual(load_user(str(self.user_id)).name, 'John Smith')
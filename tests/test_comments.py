@@ -0,0 +1,116 @@
+import unittest
+from datetime import datetime
+
+from app import create_app, db, last_seen
+from app.models import User, Post, Role, Comment
+from app.query_guard import query_count
+
+
+class CommentTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john', password='cat', confirmed=True)
+        self.mod = User(email='mod@example.com', username='mod', password='cat', confirmed=True,
+                        role=Role.query.filter_by(name='Moderator').first())
+        self.post = Post(body='hello', author=self.john, time=datetime(2020, 1, 1))
+        db.session.add_all([self.john, self.mod, self.post])
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def comment(self, body, parent=None):
+        comment = Comment(body=body, post=self.post, parent=parent, author=self.john)
+        db.session.add(comment)
+        db.session.commit()
+        return comment
+
+    def build_thread(self):
+        a = self.comment('a')
+        b = self.comment('b')
+        a1 = self.comment('a1', a)
+        a1x = self.comment('a1x', a1)
+        a2 = self.comment('a2', a)
+        b1 = self.comment('b1', b)
+        return a, b, a1, a1x, a2, b1
+
+    def bodies(self, comments):
+        return [comment.body for comment in comments]
+
+    def test_materialized_path(self):
+        a, b, a1, a1x, a2, b1 = self.build_thread()
+        self.assertEqual(a.path, Comment.segment(a.id))
+        self.assertEqual(a1x.path, '.'.join(Comment.segment(c.id) for c in (a, a1, a1x)))
+        self.assertEqual(a1x.depth, 2)
+        self.assertEqual(Comment.segment(36), '000010')
+        self.assertEqual(self.bodies(Comment.thread(self.post).items),
+                         ['a', 'a1', 'a1x', 'a2', 'b', 'b1'])
+        self.assertEqual(self.bodies(a.subtree()), ['a', 'a1', 'a1x', 'a2'])
+        self.assertEqual(self.bodies(a1.subtree()), ['a1', 'a1x'])
+
+    def test_thread_pagination(self):
+        self.build_thread()
+        page = Comment.thread(self.post, per_page=4)
+        self.assertEqual(self.bodies(page), ['a', 'a1', 'a1x', 'a2'])
+        page = Comment.thread(self.post, after=page.next_cursor, per_page=4)
+        self.assertEqual(self.bodies(page), ['b', 'b1'])
+        self.assertFalse(page.has_next)
+
+    def test_comments_count(self):
+        a, *_ = self.build_thread()
+        db.session.refresh(self.post)
+        self.assertEqual(self.post.comments_count, 6)
+        db.session.delete(Comment.query.filter_by(body='b1').first())
+        db.session.commit()
+        self.assertEqual(self.post.comments_count, 5)
+
+    def test_hide_subtree_in_one_statement(self):
+        a, b, a1, a1x, a2, b1 = self.build_thread()
+        db.session.refresh(a)
+        issued = query_count()
+        with self.app.test_request_context():
+            self.assertEqual(a.hide_subtree(), 4)
+        # one UPDATE for the comments, one for the post counter
+        self.assertEqual(query_count() - issued, 2)
+        db.session.commit()
+        self.assertEqual(self.bodies(Comment.thread(self.post).items), ['b', 'b1'])
+        self.assertEqual(len(Comment.thread(self.post, include_disabled=True).items), 6)
+        self.assertEqual(self.post.comments_count, 2)
+        with self.app.test_request_context():
+            self.assertEqual(a.hide_subtree(), 0)
+
+    def test_comment_views(self):
+        client = self.app.test_client()
+        client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        response = client.post(f'/post/{self.post.id}', data={'body': 'first!'})
+        self.assertEqual(response.status_code, 302)
+        first = Comment.query.filter_by(body='first!').one()
+        client.post(f'/post/{self.post.id}', data={'body': 'a reply', 'parent': first.id})
+        reply = Comment.query.filter_by(body='a reply').one()
+        self.assertEqual(reply.parent_id, first.id)
+        response = client.get(f'/post/{self.post.id}')
+        self.assertIn(b'a reply', response.data)
+        self.assertIn(b'2 Comments', response.data)
+        self.assertEqual(client.post(f'/moderate/comment/{first.id}/hide').status_code, 403)
+
+        moderator = self.app.test_client()
+        moderator.post('/auth/login', data={'email': 'mod@example.com', 'password': 'cat'})
+        self.assertEqual(moderator.get(f'/moderate/comment/{first.id}/hide').status_code, 405)
+        self.assertIn(b'Hide thread', moderator.get(f'/post/{self.post.id}').data)
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        self.assertEqual(moderator.post(f'/moderate/comment/{first.id}/hide').status_code, 400)
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.assertEqual(moderator.post(f'/moderate/comment/{first.id}/hide').status_code, 302)
+        response = client.get(f'/post/{self.post.id}')
+        self.assertNotIn(b'a reply', response.data)
+        self.assertIn(b'0 Comments', response.data)
+        response = client.post(f'/post/{self.post.id}', data={'body': 'sneaky', 'parent': first.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Comment.query.filter_by(body='sneaky').first())
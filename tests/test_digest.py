@@ -0,0 +1,167 @@
+import unittest
+
+from app import create_app, db, mail_queue
+from app.digest import send_digests
+from app.models import User, Post, Role, Comment, Follow, Notification
+from app.query_guard import query_count
+
+
+class FakeConnection:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def __enter__(self):
+        self.transport.connections += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        if len(self.transport.sent) == self.transport.fail_after:
+            raise ConnectionError('SMTP went away')
+        self.transport.sent.append(msg)
+
+
+class FakeTransport:
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.connections = 0
+        self.sent = []
+
+    def __call__(self, app):
+        return FakeConnection(self)
+
+
+class DigestTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_ADMIN'] = 'admin@example.com'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.admin = User(email='admin@example.com', username='admin', password='cat')
+        self.john = User(email='john@example.com', username='john', password='cat')
+        self.susan = User(email='susan@example.com', username='susan', password='cat')
+        self.david = User(email='david@example.com', username='david', password='cat')
+        db.session.add_all([self.admin, self.john, self.susan, self.david])
+        db.session.commit()
+        self.transport = FakeTransport()
+        self.connect = mail_queue.connect
+        mail_queue.connect = self.transport
+
+    def tearDown(self) -> None:
+        mail_queue.connect = self.connect
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def pending(self, user=None):
+        query = Notification.query
+        if user is not None:
+            query = query.filter_by(recipient_id=user.id)
+        return query.count()
+
+    def test_events_are_recorded(self):
+        self.susan.follow(self.john)
+        post = Post(body='hello', author=self.john)
+        db.session.add(post)
+        db.session.commit()
+        own = Comment(body='mine', post=post, author=self.john)
+        comment = Comment(body='nice', post=post, author=self.susan)
+        db.session.add_all([own, comment])
+        db.session.commit()
+        db.session.add(Comment(body='thanks', post=post, parent=comment, author=self.david))
+        db.session.add(Comment(body='me too', post=post, parent=own, author=self.david))
+        db.session.commit()
+        kinds = sorted((n.recipient_id, n.kind) for n in Notification.query)
+        self.assertEqual(kinds, sorted([(self.john.id, 'follow'), (self.john.id, 'comment'),
+                                        (self.susan.id, 'reply'), (self.john.id, 'comment'),
+                                        (self.john.id, 'reply')]))
+
+    def test_disabled_comments_notify_nobody(self):
+        post = Post(body='hello', author=self.john)
+        comment = Comment(body='nice', post=post, author=self.susan)
+        db.session.add_all([post, comment])
+        db.session.commit()
+        before = self.pending()
+        db.session.add_all([Comment(body='spam', post=post, author=self.david, disabled=True),
+                            Comment(body='spam', post=post, parent=comment, author=self.david,
+                                    disabled=True)])
+        db.session.commit()
+        self.assertEqual(self.pending(), before)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_register_notifies_admin(self):
+        client = self.app.test_client()
+        client.post('/auth/register', data={'email': 'mary@example.com', 'username': 'mary',
+                                            'password': 'cat', 'password2': 'cat'})
+        mail_queue.flush()
+        notification = Notification.query.filter_by(recipient_id=self.admin.id).one()
+        self.assertEqual(notification.kind, 'new_user')
+        self.assertEqual(notification.actor_id, User.query.filter_by(username='mary').one().id)
+
+    def test_one_digest_per_recipient(self):
+        for user in (self.susan, self.david):
+            user.follow(self.john)
+        self.john.follow(self.susan)
+        db.session.commit()
+        stats = send_digests()
+        self.assertEqual(stats, {'digests': 2, 'events': 3, 'connections': 1})
+        self.assertEqual(self.transport.connections, 1)
+        self.assertEqual(sorted(msg.recipients[0] for msg in self.transport.sent),
+                         ['john@example.com', 'susan@example.com'])
+        msg = next(msg for msg in self.transport.sent if msg.recipients == ['john@example.com'])
+        self.assertIn('2 new notifications', msg.subject)
+        self.assertIn('susan started following you', msg.body)
+        self.assertIn('http://localhost:5000/auth/user/david', msg.body)
+        self.assertIn('david', msg.html)
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual(send_digests()['digests'], 0)
+
+    def test_digest_keeps_newest_items(self):
+        self.app.config['SOCIAL_BLOG_DIGEST_MAX_ITEMS'] = 2
+        post = Post(body='hello', author=self.john)
+        db.session.add(post)
+        db.session.commit()
+        for i in range(5):
+            db.session.add(Comment(body=f'comment {i}', post=post, author=self.susan))
+            db.session.commit()
+        latest = Comment.query.order_by(Comment.id.desc()).first()
+        send_digests()
+        msg, = self.transport.sent
+        self.assertIn('5 new notifications', msg.subject)
+        self.assertEqual(msg.body.count('commented on your post'), 2)
+        self.assertIn(f'#comment-{latest.id}', msg.body)
+        self.assertIn('and 3 earlier notifications', msg.body)
+
+    def test_batches_use_constant_queries(self):
+        users = [User(email=f'user{i}@example.com', username=f'user{i}') for i in range(6)]
+        db.session.add_all(users)
+        db.session.commit()
+        for user in users:
+            db.session.add(Follow(follower=self.john, followed=user))
+        db.session.commit()
+        with self.app.test_request_context():
+            issued = query_count()
+            stats = send_digests(batch_size=3)
+            # high water, then per batch: recipients, events, users, delete;
+            # and a final empty recipient lookup
+            self.assertEqual(query_count() - issued, 1 + 2 * 4 + 1)
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(len(self.transport.sent), 6)
+
+    def test_failed_send_keeps_unsent_events(self):
+        for user in (self.john, self.susan, self.david):
+            self.admin.follow(user)
+        db.session.commit()
+        self.transport.fail_after = 1
+        with self.assertRaises(ConnectionError):
+            send_digests()
+        self.assertEqual(self.pending(), 2)
+        self.assertEqual(self.pending(self.john), 0)
+
+        self.transport.fail_after = None
+        self.assertEqual(send_digests()['digests'], 2)
+        self.assertEqual(self.pending(), 0)
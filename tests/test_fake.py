@@ -0,0 +1,29 @@
+import unittest
+
+from app import create_app, db, fake
+from app.models import User, Post, Follow, TimelineEntry
+
+
+class FakeDataTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_seed(self):
+        fake.seed(users=20, posts=300, follows=3, batch_size=50, random_seed=1)
+        self.assertEqual(User.query.count(), 20)
+        self.assertEqual(Post.query.count(), 300)
+        self.assertEqual(db.session.query(db.func.sum(User.posts_count)).scalar(), 300)
+        self.assertEqual(db.session.query(db.func.sum(User.followers_count)).scalar(),
+                         Follow.query.count())
+        busiest = User.query.order_by(User.posts_count.desc()).first()
+        self.assertGreater(busiest.posts_count, 300 / 20 * 2)
+        self.assertGreaterEqual(TimelineEntry.query.count(), 300)
+        self.assertTrue(User.query.first().verify_password('password'))
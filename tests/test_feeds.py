@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+
+from app import create_app, db, fragment_cache
+from app.models import User, Post, Role
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        fragment_cache.clear()
+        self.john = User(email='john@example.com', username='john')
+        self.susan = User(email='susan@example.com', username='susan')
+        db.session.add_all([self.john, self.susan])
+        db.session.commit()
+        self.post(self.john, 'hello *world*', 0)
+        self.post(self.susan, 'from susan', 1)
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, author, body, minutes):
+        post = Post(body=body, author=author,
+                    time=datetime(2020, 1, 1) + timedelta(minutes=minutes))
+        db.session.add(post)
+        db.session.commit()
+        return post
+
+    def entries(self, response):
+        feed = ElementTree.fromstring(response.data)
+        return [entry.find(f'{ATOM}content').text for entry in feed.iter(f'{ATOM}entry')]
+
+    def test_site_feed(self):
+        response = self.client.get('/feed.atom')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/atom+xml')
+        self.assertTrue(response.cache_control.public)
+        self.assertEqual(self.entries(response),
+                         ['<p>from susan</p>', '<p>hello <em>world</em></p>'])
+
+    def test_user_feed(self):
+        response = self.client.get('/feed/john.atom')
+        self.assertEqual(self.entries(response), ['<p>hello <em>world</em></p>'])
+        self.assertEqual(self.client.get('/feed/nobody.atom').status_code, 404)
+
+    def test_feed_is_cached_until_new_post(self):
+        etag = self.client.get('/feed/john.atom').headers['ETag']
+        misses = fragment_cache.stats()['misses']
+        response = self.client.get('/feed/john.atom', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.client.get('/feed/john.atom')
+        self.assertEqual(fragment_cache.stats()['misses'], misses)
+
+        self.post(self.john, 'second', 2)
+        response = self.client.get('/feed/john.atom', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.entries(response)[0], '<p>second</p>')
+        # the feed and the new entry are rendered, the old entry is reused
+        self.assertEqual(fragment_cache.stats()['misses'], misses + 2)
+
+    def test_edited_post_invalidates_feed(self):
+        self.client.get('/feed.atom')
+        post = Post.query.filter_by(author_id=self.susan.id).first()
+        post.body = 'edited'
+        db.session.commit()
+        self.assertIn('<p>edited</p>', self.entries(self.client.get('/feed.atom')))
+
+    def test_author_profile_change_invalidates_site_feed(self):
+        etag = self.client.get('/feed.atom').headers['ETag']
+        self.susan.name = 'Susan Smith'
+        db.session.commit()
+        response = self.client.get('/feed.atom', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_hidden_post_changes_feed_etag(self):
+        etag = self.client.get('/feed/john.atom').headers['ETag']
+        Post.moderate([Post.query.filter_by(author_id=self.john.id).first().id], 'hide')
+        db.session.commit()
+        response = self.client.get('/feed/john.atom', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,162 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, last_seen
+from app.models import User, Post, Follow, TimelineEntry, Role
+
+
+class FollowTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john')
+        self.susan = User(email='susan@example.com', username='susan')
+        self.david = User(email='david@example.com', username='david')
+        db.session.add_all([self.john, self.susan, self.david])
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, author, body, minutes=0):
+        post = Post(body=body, author=author, time=datetime(2020, 1, 1) + timedelta(minutes=minutes))
+        db.session.add(post)
+        db.session.commit()
+        return post
+
+    def timeline(self, user, **kwargs):
+        return [post.body for post in user.home_timeline(**kwargs)]
+
+    def test_follow_and_unfollow(self):
+        self.john.follow(self.susan)
+        db.session.commit()
+        self.assertTrue(self.john.is_following(self.susan))
+        self.assertTrue(self.susan.is_followed_by(self.john))
+        self.assertEqual(self.susan.followers_count, 1)
+        self.john.unfollow(self.susan)
+        db.session.commit()
+        self.assertFalse(self.john.is_following(self.susan))
+        self.assertEqual(Follow.query.count(), 0)
+
+    def test_posts_fan_out_to_followers(self):
+        self.john.follow(self.susan)
+        db.session.commit()
+        self.post(self.susan, 'from susan', 1)
+        self.post(self.david, 'from david', 2)
+        self.post(self.john, 'from john', 3)
+        self.assertEqual(self.timeline(self.john), ['from john', 'from susan'])
+        self.assertEqual(self.timeline(self.susan), ['from susan'])
+
+    def test_follow_backfills_and_unfollow_forgets(self):
+        self.post(self.susan, 'old susan post')
+        self.john.follow(self.susan)
+        db.session.commit()
+        self.assertEqual(self.timeline(self.john), ['old susan post'])
+        self.john.unfollow(self.susan)
+        db.session.commit()
+        self.assertEqual(self.timeline(self.john), [])
+
+    def test_high_fanout_authors_merge_at_read(self):
+        self.app.config['SOCIAL_BLOG_FANOUT_CUTOFF'] = 1
+        self.john.follow(self.susan)
+        self.david.follow(self.susan)
+        self.john.follow(self.david)
+        db.session.commit()
+        self.post(self.susan, 'celebrity post', 1)
+        self.post(self.david, 'david post', 2)
+        self.assertEqual(TimelineEntry.query.filter_by(user_id=self.john.id).count(), 1)
+        self.assertEqual(self.timeline(self.john), ['david post', 'celebrity post'])
+
+    def test_merged_timeline_pages(self):
+        self.app.config['SOCIAL_BLOG_FANOUT_CUTOFF'] = 1
+        self.john.follow(self.susan)
+        self.david.follow(self.susan)
+        self.john.follow(self.david)
+        db.session.commit()
+        for i in range(5):
+            self.post(self.susan, f'susan {i}', 2 * i)
+            self.post(self.david, f'david {i}', 2 * i + 1)
+        first = self.john.home_timeline(per_page=4)
+        second = self.john.home_timeline(after=first.next_cursor, per_page=4)
+        third = self.john.home_timeline(after=second.next_cursor, per_page=4)
+        bodies = [p.body for p in first.items + second.items + third.items]
+        self.assertEqual(bodies, [p.body for p in
+                                  Post.query.order_by(Post.time.desc()).all()])
+        self.assertFalse(third.has_next)
+        back = self.john.home_timeline(before=second.prev_cursor, per_page=4)
+        self.assertEqual(back.items, first.items)
+
+    def test_counters_track_writes(self):
+        self.john.follow(self.susan)
+        self.david.follow(self.susan)
+        db.session.commit()
+        post = self.post(self.susan, 'counted')
+        self.post(self.susan, 'counted too')
+        self.assertEqual((self.susan.posts_count, self.susan.followers_count), (2, 2))
+        self.assertEqual(self.john.followed_count, 1)
+        db.session.delete(post)
+        self.john.unfollow(self.susan)
+        db.session.commit()
+        self.assertEqual((self.susan.posts_count, self.susan.followers_count), (1, 1))
+        self.assertEqual(self.john.followed_count, 0)
+
+    def test_reconcile_counters(self):
+        self.john.follow(self.susan)
+        db.session.commit()
+        self.post(self.susan, 'counted')
+        users = User.__table__
+        db.session.execute(users.update().values(posts_count=7, followers_count=7, followed_count=7))
+        db.session.commit()
+        self.assertEqual(User.reconcile_counters(batch_size=2), 3)
+        self.assertEqual((self.susan.posts_count, self.susan.followers_count,
+                          self.susan.followed_count), (1, 1, 0))
+        self.assertEqual(self.john.followed_count, 1)
+
+    def test_author_back_under_cutoff_is_backfilled(self):
+        self.app.config['SOCIAL_BLOG_FANOUT_CUTOFF'] = 1
+        self.john.follow(self.susan)
+        self.david.follow(self.susan)
+        db.session.commit()
+        post = self.post(self.susan, 'celebrity post', 1)
+        self.assertIsNone(TimelineEntry.query.filter_by(user_id=self.john.id,
+                                                        post_id=post.id).first())
+        self.david.unfollow(self.susan)
+        db.session.commit()
+        self.assertIsNotNone(TimelineEntry.query.filter_by(user_id=self.john.id,
+                                                           post_id=post.id).first())
+        self.assertEqual(self.timeline(self.john), ['celebrity post'])
+
+    def login(self):
+        self.john.password = 'cat'
+        self.john.confirmed = True
+        db.session.commit()
+        client = self.app.test_client()
+        client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        return client
+
+    def test_follow_views_require_post(self):
+        client = self.login()
+        self.assertEqual(client.get('/auth/follow/susan').status_code, 405)
+        self.assertEqual(client.post('/auth/follow/susan').status_code, 302)
+        self.assertTrue(self.john.is_following(self.susan))
+        self.assertIn(b'action="/auth/unfollow/susan"', client.get('/auth/user/susan').data)
+        self.assertEqual(client.get('/auth/unfollow/susan').status_code, 405)
+        self.assertEqual(client.post('/auth/unfollow/susan').status_code, 302)
+        self.assertFalse(self.john.is_following(self.susan))
+
+    def test_follow_requires_csrf_token(self):
+        client = self.login()
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        self.assertEqual(client.post('/auth/follow/susan').status_code, 400)
+        self.assertFalse(self.john.is_following(self.susan))
+        page = client.get('/auth/user/susan').get_data(as_text=True)
+        token = page.split('name="csrf_token" type="hidden" value="')[1].split('"')[0]
+        response = client.post('/auth/follow/susan', data={'csrf_token': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.john.is_following(self.susan))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from flask import render_template
+
+from app import create_app, db, fragment_cache
+from app.caching import LRUBackend, SQLiteBackend
+from app.models import Post, User
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.author = User(email='john@example.com', username='john')
+        self.post = Post(body='first post', author=self.author)
+        db.session.add(self.post)
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def render(self):
+        with self.app.test_request_context('/index'):
+            return render_template('_posts.html', posts=[self.post])
+
+    def test_hits_after_first_render(self):
+        first = self.render()
+        self.assertEqual(self.render(), first)
+        self.assertEqual(fragment_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_post_edit_invalidates(self):
+        self.render()
+        self.post.body = 'edited post'
+        db.session.commit()
+        self.assertIn('edited post', self.render())
+        self.assertEqual(fragment_cache.stats()['misses'], 2)
+
+    def test_edit_from_another_process_invalidates(self):
+        self.render()
+        # A write made elsewhere never reaches this process's delete_posts().
+        posts = Post.__table__
+        db.session.execute(posts.update()
+                           .where(posts.c.id == self.post.id)
+                           .values(body_html='<p>edited elsewhere</p>',
+                                   version=posts.c.version + 1))
+        db.session.commit()
+        db.session.refresh(self.post)
+        self.assertIn('edited elsewhere', self.render())
+
+    def test_edit_bumps_version(self):
+        version = self.post.version
+        self.post.body = 'edited post'
+        db.session.commit()
+        self.assertEqual(self.post.version, version + 1)
+        self.post.disabled = True
+        db.session.commit()
+        self.assertEqual(self.post.version, version + 2)
+
+    def test_profile_change_invalidates(self):
+        self.render()
+        version = self.author.profile_version
+        self.author.username = 'johnny'
+        db.session.commit()
+        self.assertGreater(self.author.profile_version, version)
+        self.assertIn('johnny', self.render())
+        self.assertEqual(fragment_cache.stats()['hits'], 0)
+
+    def test_email_change_refreshes_avatar(self):
+        avatar = self.author.avatar_hash
+        self.author.email = 'johnny@example.com'
+        db.session.commit()
+        self.assertNotEqual(self.author.avatar_hash, avatar)
+
+
+class BackendTestCase(unittest.TestCase):
+    def test_lru_is_bounded(self):
+        backend = LRUBackend(maxsize=2)
+        backend.set('a', '1')
+        backend.set('b', '2')
+        backend.get('a')
+        backend.set('c', '3')
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), '1')
+
+    def test_sqlite_backend(self):
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        try:
+            backend = SQLiteBackend(path)
+            backend.set('a', '1')
+            self.assertEqual(backend.get('a'), '1')
+            backend.delete('a')
+            self.assertIsNone(backend.get('a'))
+            backend.conn.close()
+        finally:
+            os.remove(path)
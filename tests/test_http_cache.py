@@ -0,0 +1,107 @@
+import unittest
+from datetime import datetime
+
+from app import create_app, db, last_seen
+from app.models import User, Post, Role
+
+
+class HttpCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john',
+                         password='cat', confirmed=True)
+        db.session.add(self.john)
+        db.session.commit()
+        self.post('first', datetime(2020, 1, 1))
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, body, time):
+        db.session.add(Post(body=body, author=self.john, time=time))
+        db.session.commit()
+
+    def test_index_not_modified(self):
+        response = self.client.get('/index')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        self.assertTrue(response.cache_control.public)
+        self.assertIn('Cookie', response.vary)
+        self.assertIsNone(response.last_modified)
+
+        response = self.client.get('/index', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        self.post('second', datetime(2020, 1, 2))
+        response = self.client.get('/index', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'second', response.data)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_index_etag_follows_rendered_posts(self):
+        post = Post.query.first()
+        etag = self.client.get('/index').headers['ETag']
+        for change in (lambda: setattr(post, 'body', 'edited'),
+                       lambda: setattr(post, 'disabled', True),
+                       lambda: setattr(post, 'comments_count', 1),
+                       lambda: setattr(self.john, 'name', 'John Smith')):
+            change()
+            db.session.commit()
+            response = self.client.get('/index', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers['ETag']
+
+    def test_index_etag_depends_on_url(self):
+        etag = self.client.get('/index').headers['ETag']
+        response = self.client.get('/index?after=bad', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_page_not_modified(self):
+        response = self.client.get('/auth/user/john')
+        etag = response.headers['ETag']
+        response = self.client.get('/auth/user/john', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.john.location = 'Paris'
+        db.session.commit()
+        response = self.client.get('/auth/user/john', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Paris', response.data)
+
+        etag = response.headers['ETag']
+        Post.moderate([Post.query.first().id], 'hide')
+        db.session.commit()
+        response = self.client.get('/auth/user/john', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_signed_in_pages_are_private(self):
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        response = self.client.get('/index')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.private)
+        self.assertTrue(response.cache_control.no_cache)
+        self.assertIsNone(response.last_modified)
+        anonymous = self.app.test_client().get('/index')
+        self.assertNotEqual(response.headers['ETag'], anonymous.headers['ETag'])
+
+        response = self.client.get('/index', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_pending_flash_is_rendered(self):
+        etag = self.client.get('/index').headers['ETag']
+        with self.client.session_transaction() as session:
+            session['_flashes'] = [('message', 'Hello there')]
+        response = self.client.get('/index', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
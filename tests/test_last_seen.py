@@ -0,0 +1,60 @@
+import gc
+import unittest
+import weakref
+from datetime import datetime, timedelta
+
+from app import create_app, db, last_seen
+from app.models import User
+
+
+class LastSeenBufferTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(email='john@example.com', username='john',
+                         last_seen=datetime(2020, 1, 1))
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_ping_does_not_dirty_session(self):
+        self.assertTrue(self.user.ping())
+        self.assertNotIn(self.user, db.session.dirty)
+        self.assertIn(self.user.id, last_seen.pending())
+
+    def test_ping_is_coalesced(self):
+        now = datetime(2021, 1, 1)
+        self.assertTrue(last_seen.touch(self.user, now=now))
+        self.assertFalse(last_seen.touch(self.user, now=now + timedelta(seconds=30)))
+        self.assertTrue(last_seen.touch(self.user, now=now + timedelta(seconds=90)))
+        self.assertEqual(last_seen.pending(), {self.user.id: now + timedelta(seconds=90)})
+
+    def test_flush_writes_batch(self):
+        other = User(email='jane@example.com', username='jane',
+                     last_seen=datetime(2020, 1, 1))
+        db.session.add(other)
+        db.session.commit()
+        now = datetime(2021, 1, 1)
+        last_seen.touch(self.user, now=now)
+        last_seen.touch(other, now=now)
+        self.assertEqual(last_seen.flush(), 2)
+        self.assertEqual(last_seen.pending(), {})
+        db.session.expire_all()
+        self.assertEqual(User.query.get(self.user.id).last_seen, now)
+        self.assertEqual(User.query.get(other.id).last_seen, now)
+
+    def test_discarded_app_is_not_kept_alive(self):
+        app = create_app('testing')
+        with app.app_context():
+            last_seen.touch(self.user, now=datetime(2021, 1, 1))
+        ref = weakref.ref(app)
+        del app
+        gc.collect()
+        self.assertIsNone(ref())
@@ -0,0 +1,91 @@
+import unittest
+
+from flask_mail import Message
+
+from app import create_app, mail, mail_queue
+from app.email import send_email
+from app.mail_queue import MailQueue
+
+
+class FakeConnection:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def __enter__(self):
+        self.transport.connections += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        if self.transport.failures:
+            self.transport.failures -= 1
+            raise ConnectionError('SMTP went away')
+        self.transport.sent.append(msg)
+
+
+class FakeTransport:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.connections = 0
+        self.sent = []
+
+    def __call__(self, app):
+        return FakeConnection(self)
+
+
+class MailQueueTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_MAIL_WORKERS'] = 1
+        self.app.config['SOCIAL_BLOG_MAIL_RETRY_BACKOFF'] = 0
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self) -> None:
+        self.app_context.pop()
+
+    def make_queue(self, transport):
+        queue = MailQueue(connect=transport)
+        queue.init_app(self.app)
+        return queue
+
+    def message(self, i):
+        return Message(f'hello {i}', sender='admin@example.com', recipients=['u@example.com'])
+
+    def test_batches_share_a_connection(self):
+        transport = FakeTransport()
+        queue = self.make_queue(transport)
+        for i in range(10):
+            queue.enqueue(self.message(i))
+        queue.shutdown(self.app)
+        self.assertEqual(len(transport.sent), 10)
+        self.assertLess(transport.connections, 10)
+        stats = queue.stats()
+        self.assertEqual(stats['sent'], 10)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_retry_with_backoff(self):
+        transport = FakeTransport(failures=2)
+        queue = self.make_queue(transport)
+        queue.enqueue(self.message(0))
+        queue.shutdown(self.app)
+        self.assertEqual(len(transport.sent), 1)
+        self.assertEqual(queue.stats()['retries'], 2)
+
+    def test_gives_up_after_retries(self):
+        self.app.config['SOCIAL_BLOG_MAIL_RETRIES'] = 1
+        transport = FakeTransport(failures=5)
+        queue = self.make_queue(transport)
+        queue.enqueue(self.message(0))
+        queue.shutdown(self.app)
+        self.assertEqual(transport.sent, [])
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_send_email_uses_flask_mail(self):
+        with self.app.test_request_context(), mail.record_messages() as outbox:
+            send_email('john@example.com', 'Welcome', 'mail/new_user', user={'username': 'john'})
+            mail_queue.flush()
+        self.assertEqual(len(outbox), 1)
+        self.assertIn('john', outbox[0].body)
@@ -0,0 +1,59 @@
+import unittest
+
+from app import create_app, db, metrics
+from app.models import Post, User
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_METRICS'] = True
+        self.app.config['SOCIAL_BLOG_METRICS_HEADERS'] = True
+        metrics.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Post(body='hello', author=User(email='john@example.com', username='john')))
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_disabled_by_default(self):
+        app = create_app('testing')
+        self.assertEqual(app.test_client().get('/metrics').status_code, 404)
+
+    def test_timing_headers(self):
+        response = self.client.get('/index')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response.headers['X-Query-Count']), 0)
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+        self.assertIn('tpl;dur=', response.headers['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/index')
+        self.client.get('/index')
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('socialblog_request_duration_seconds_count{endpoint="main.index"} 2', body)
+        self.assertIn('socialblog_sql_queries_total{endpoint="main.index"}', body)
+        self.assertIn('socialblog_template_seconds_total{endpoint="main.index"}', body)
+        self.assertIn('socialblog_mail_queue_depth 0', body)
+        self.assertIn('socialblog_fragment_cache_hits_total 1', body)
+
+    def test_streamed_page_is_recorded_when_closed(self):
+        self.app.config['SOCIAL_BLOG_STREAM_PAGES'] = False
+        rendered = self.client.get('/auth/user/john')
+        self.app.config['SOCIAL_BLOG_STREAM_PAGES'] = True
+        response = self.client.get('/auth/user/john')
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(response.get_data(), rendered.get_data())
+        stats = self.app.extensions['metrics']['endpoints']['auth.user']
+        self.assertEqual(stats.count, 1)
+        template_seconds = stats.template_seconds
+        response.close()
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.sql_queries, 2 * int(rendered.headers['X-Query-Count']))
+        self.assertGreater(stats.template_seconds, template_seconds)
@@ -0,0 +1,142 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, last_seen, fragment_cache, identity_cache
+from app.models import User, Post, Role
+from app.query_guard import query_count
+
+
+class ModerationTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_POSTS_PER_PAGE'] = 3
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        fragment_cache.clear()
+        roles = {role.name: role for role in Role.query}
+        self.admin = User(email='admin@example.com', username='admin', password='cat',
+                          confirmed=True, role=roles['Administrator'])
+        self.mod = User(email='mod@example.com', username='mod', password='cat',
+                        confirmed=True, role=roles['Moderator'])
+        self.john = User(email='john@example.com', username='john', password='cat',
+                         confirmed=True)
+        self.users = [User(email=f'user{i}@example.com', username=f'user{i}') for i in range(4)]
+        db.session.add_all([self.admin, self.mod, self.john] + self.users)
+        db.session.commit()
+        self.posts = [Post(body=f'post {i}', author=self.john,
+                           time=datetime(2020, 1, 1) + timedelta(minutes=i)) for i in range(5)]
+        db.session.add_all(self.posts)
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def client_for(self, email):
+        client = self.app.test_client()
+        client.post('/auth/login', data={'email': email, 'password': 'cat'})
+        return client
+
+    def test_flag_and_queue_pagination(self):
+        client = self.client_for('john@example.com')
+        response = client.get(f'/flag/post/{self.posts[0].id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(Post.query.get(self.posts[0].id).flagged_at)
+        for post in self.posts:
+            self.assertEqual(client.post(f'/flag/post/{post.id}').status_code, 302)
+        flagged_at = Post.query.get(self.posts[0].id).flagged_at
+        client.post(f'/flag/post/{self.posts[0].id}')
+        self.assertEqual(Post.query.get(self.posts[0].id).flagged_at, flagged_at)
+
+        self.assertEqual(client.get('/moderate/posts').status_code, 403)
+        moderator = self.client_for('mod@example.com')
+        response = moderator.get('/moderate/posts')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.count(b'name="ids"'), 3)
+        self.assertIn(b'Older', response.data)
+
+    def test_flags_require_post_with_csrf_token(self):
+        client = self.client_for('john@example.com')
+        self.assertEqual(client.get('/flag/user/user0').status_code, 405)
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        response = client.get(f'/flag/post/{self.posts[0].id}')
+        self.assertIn(b'name="csrf_token"', response.data)
+        self.assertEqual(client.post(f'/flag/post/{self.posts[0].id}').status_code, 200)
+        self.assertEqual(client.post('/flag/user/user0').status_code, 400)
+        self.assertIsNone(Post.query.get(self.posts[0].id).flagged_at)
+        self.assertIsNone(User.query.filter_by(username='user0').one().flagged_at)
+
+        token = response.data.split(b'name="csrf_token" type="hidden" value="')[1].split(b'"')[0]
+        response = client.post(f'/flag/post/{self.posts[0].id}', data={'csrf_token': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(client.post('/flag/user/user0', data={'csrf_token': token}).status_code,
+                         302)
+        self.assertIsNotNone(Post.query.get(self.posts[0].id).flagged_at)
+        self.assertIsNotNone(User.query.filter_by(username='user0').one().flagged_at)
+
+    def test_bulk_hide_posts(self):
+        ids = [post.id for post in self.posts]
+        for id in ids:
+            Post.flag(id)
+        db.session.commit()
+        anonymous = self.app.test_client()
+        self.assertIn(b'post 4', anonymous.get('/index').data)
+        anonymous.get('/feed/john.atom')
+
+        moderator = self.client_for('mod@example.com')
+        issued = query_count()
+        with self.app.test_request_context():
+            self.assertEqual(Post.moderate(ids[2:], 'hide'), 3)
+        # one UPDATE plus one lookup of the authors whose caches go stale
+        self.assertEqual(query_count() - issued, 2)
+        db.session.commit()
+
+        response = anonymous.get('/index')
+        self.assertNotIn(b'post 4', response.data)
+        self.assertIn(b'disabled by a moderator', response.data)
+        feed = anonymous.get('/feed/john.atom').data
+        self.assertNotIn(b'post 4', feed)
+        self.assertIn(b'post 1', feed)
+        self.assertEqual(Post.query.filter(Post.flagged_at.isnot(None)).count(), 2)
+
+        response = moderator.post('/moderate/posts', data={'action': 'dismiss',
+                                                           'ids': ids[:2]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.query.filter(Post.flagged_at.isnot(None)).count(), 0)
+        self.assertEqual(Post.query.filter_by(disabled=True).count(), 3)
+
+    def test_bulk_user_actions(self):
+        ids = [user.id for user in self.users]
+        for id in ids:
+            User.flag(id)
+        db.session.commit()
+        identity_cache.load(ids[0])
+
+        moderator = self.client_for('mod@example.com')
+        moderator.post('/moderate/users', data={'action': 'confirm', 'ids': ids[:2]})
+        self.assertEqual(User.query.filter(User.id.in_(ids), User.confirmed == True).count(), 2)  # noqa: E712
+        self.assertTrue(identity_cache.load(ids[0]).confirmed)
+        response = moderator.post('/moderate/users', data={'action': 'role', 'ids': ids[2:]})
+        self.assertEqual(response.status_code, 200)
+
+        admin = self.client_for('admin@example.com')
+        moderator_role = Role.query.filter_by(name='Moderator').first()
+        admin.post('/moderate/users', data={'action': 'role', 'role': moderator_role.id,
+                                            'ids': ids[2:]})
+        self.assertEqual(User.query.filter(User.id.in_(ids), User.role_id == moderator_role.id).count(), 2)
+        self.assertEqual(User.query.filter(User.flagged_at.isnot(None)).count(), 0)
+        self.assertTrue(User.query.get(ids[2]).profile_version > 0)
+
+    def test_admin_form_roles_come_from_cache(self):
+        from app.auth.forms import EditProfileAdminForm
+        with self.app.test_request_context():
+            form = EditProfileAdminForm(user=self.john)
+            issued = query_count()
+            form = EditProfileAdminForm(user=self.john)
+            self.assertEqual(query_count(), issued)
+        self.assertEqual([name for _, name in form.role.choices],
+                         ['Administrator', 'Moderator', 'User'])
@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import Post, User
+from app.pagination import keyset_paginate, encode_cursor, decode_cursor, InvalidCursor
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        author = User(email='john@example.com', username='john', password='cat')
+        start = datetime(2020, 1, 1)
+        for i in range(25):
+            db.session.add(Post(body=f'post {i}', author=author,
+                                time=start + timedelta(minutes=i // 2)))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def paginate(self, **kwargs):
+        return keyset_paginate(Post.query, Post.time, Post.id, per_page=10, **kwargs)
+
+    def test_cursor_roundtrip(self):
+        now = datetime(2020, 5, 17, 12, 30, 1, 250)
+        self.assertEqual(decode_cursor(encode_cursor(now, 42)), (now, 42))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+    def test_walk_forward_and_back(self):
+        expected = Post.query.order_by(Post.time.desc(), Post.id.desc()).all()
+        first = self.paginate()
+        self.assertFalse(first.has_prev)
+        self.assertTrue(first.has_next)
+        second = self.paginate(after=first.next_cursor)
+        third = self.paginate(after=second.next_cursor)
+        self.assertFalse(third.has_next)
+        self.assertEqual(first.items + second.items + third.items, expected)
+
+        back = self.paginate(before=third.prev_cursor)
+        self.assertEqual(back.items, second.items)
+        back = self.paginate(before=back.prev_cursor)
+        self.assertEqual(back.items, first.items)
+        self.assertFalse(back.has_prev)
+
+    def test_index_pages(self):
+        client = self.app.test_client()
+        response = client.get('/index')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Older', response.data)
+        self.assertEqual(client.get('/index?after=garbage').status_code, 400)
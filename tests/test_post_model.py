@@ -0,0 +1,30 @@
+import unittest
+
+from app import create_app, db
+from app.models import Post
+
+
+class PostModelTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_body_html_rendered_on_write(self):
+        post = Post(body='**bold** <script>alert(1)</script>')
+        self.assertIn('<strong>bold</strong>', post.body_html)
+        self.assertNotIn('<script>', post.body_html)
+
+    def test_backfill_body_html(self):
+        posts = Post.__table__
+        db.session.execute(posts.insert(), [{'body': f'*post {i}*'} for i in range(7)])
+        db.session.commit()
+        self.assertEqual(Post.backfill_body_html(batch_size=3), 7)
+        self.assertEqual(Post.query.filter(Post.body_html.is_(None)).count(), 0)
+        self.assertEqual(Post.query.first().body_html, '<p><em>post 0</em></p>')
@@ -0,0 +1,40 @@
+import unittest
+
+from flask import render_template
+
+from app import create_app, db
+from app.models import Post, User
+from app.query_guard import TooManyQueries, query_count
+
+
+class QueryGuardTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_POSTS_PER_PAGE'] = 50
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for i in range(50):
+            author = User(email=f'user{i}@example.com', username=f'user{i}')
+            db.session.add(Post(body=f'post {i}', author=author))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_index_loads_authors_in_bulk(self):
+        with self.app.test_request_context('/index'):
+            self.app.preprocess_request()
+            before = query_count()
+            response = self.app.full_dispatch_request()
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(query_count() - before, 5)
+
+    def test_lazy_loads_in_template_fail(self):
+        db.session.expunge_all()
+        posts = Post.query.all()
+        with self.app.test_request_context('/index'):
+            with self.assertRaises(TooManyQueries):
+                render_template('_posts.html', posts=posts)
@@ -0,0 +1,164 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app, db, last_seen
+from app.digest import send_digests
+from app.models import User, Post, Role, Follow, Comment
+from app.pagination import encode_cursor
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Run the hot read paths and check every SELECT they issue with
+    ``EXPLAIN QUERY PLAN``: none may scan a whole table or sort through a
+    temporary B-tree."""
+
+    # The role table is read whole on purpose by the role cache.
+    full_scans_allowed = {'roles'}
+
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_FANOUT_CUTOFF'] = 0
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john',
+                         password='cat', confirmed=True)
+        self.susan = User(email='susan@example.com', username='susan', confirmed=True)
+        self.david = User(email='david@example.com', username='david', confirmed=True)
+        db.session.add_all([self.john, self.susan, self.david])
+        db.session.commit()
+        for user in (self.susan, self.david):
+            db.session.add(Follow(follower=user, followed=self.john))
+        db.session.add(Follow(follower=self.john, followed=self.susan))
+        for i in range(30):
+            db.session.add(Post(body=f'post {i}', author=(self.john, self.susan)[i % 2],
+                                time=datetime(2020, 1, 1) + timedelta(minutes=i)))
+        db.session.commit()
+        self.client = self.app.test_client()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self) -> None:
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            self.statements.append((statement, parameters))
+
+    def plans(self):
+        with db.engine.connect() as conn:
+            for statement, parameters in self.statements:
+                rows = conn.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                yield statement, [row[-1] for row in rows]
+
+    def assertIndexedPlans(self):
+        self.assertTrue(self.statements)
+        for statement, plan in self.plans():
+            for step in plan:
+                self.assertNotIn('TEMP B-TREE', step, f'{step}\n{statement}')
+                words = step.split()
+                if words[0] == 'SCAN' and 'INDEX' not in step:
+                    self.assertIn(words[1], self.full_scans_allowed, f'{step}\n{statement}')
+
+    def assertUsesIndex(self, name):
+        self.assertTrue(any(name in step for _, plan in self.plans() for step in plan),
+                        f'{name} not used')
+
+    def login(self):
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        self.statements.clear()
+
+    def test_index_pages(self):
+        cursor = encode_cursor(datetime(2020, 1, 1, 0, 20), 21)
+        self.client.get('/index')
+        self.client.get(f'/index?after={cursor}')
+        self.client.get(f'/index?before={cursor}')
+        self.assertIndexedPlans()
+
+    def test_home_timeline(self):
+        self.login()
+        self.client.set_cookie('localhost', 'show_followed', '1')
+        cursor = encode_cursor(datetime(2020, 1, 1, 0, 20), 21)
+        self.client.get('/index')
+        self.client.get(f'/index?after={cursor}')
+        self.assertIndexedPlans()
+
+    def test_user_page(self):
+        self.login()
+        self.client.get('/auth/user/john')
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_posts_author_time')
+
+    def test_feeds(self):
+        self.client.get('/feed.atom')
+        self.client.get('/feed/susan.atom')
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_posts_author_time')
+
+    def test_auth_form_validators(self):
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'dog'})
+        self.client.post('/auth/register', data={'email': 'john@example.com', 'username': 'john',
+                                                 'password': 'cat', 'password2': 'cat'})
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_users_email')
+        self.assertUsesIndex('ix_users_username')
+
+    def test_api(self):
+        data = self.client.get('/api/v1/posts/?limit=5').get_json()
+        self.client.get(data['next'])
+        data = self.client.get('/api/v1/users/john/posts/?limit=5&fields=id,time').get_json()
+        self.client.get(data['next'])
+        self.client.get('/api/v1/users/john')
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_posts_author_time')
+
+    def test_comment_thread(self):
+        post = Post.query.filter_by(author_id=self.john.id).first()
+        parent = Comment(body='parent', post=post, author=self.susan)
+        db.session.add(parent)
+        db.session.add(Comment(body='reply', post=post, parent=parent, author=self.john))
+        db.session.commit()
+        self.statements.clear()
+        self.app.config['SOCIAL_BLOG_COMMENTS_PER_PAGE'] = 1
+        self.client.get(f'/post/{post.id}')
+        self.client.get(f'/post/{post.id}?after={parent.path}')
+        list(parent.subtree())
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_comments_post_path')
+
+    def test_moderation_queue(self):
+        self.john.role = Role.query.filter_by(name='Moderator').first()
+        for post in Post.query.limit(5):
+            Post.flag(post.id)
+        User.flag(self.susan.id)
+        db.session.commit()
+        self.login()
+        self.client.get('/moderate/posts')
+        self.client.get('/moderate/users')
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_posts_flagged_at')
+        self.assertUsesIndex('ix_users_flagged_at')
+
+    def test_notification_digest(self):
+        post = Post.query.filter_by(author_id=self.john.id).first()
+        db.session.add(Comment(body='nice', post=post, author=self.susan))
+        db.session.commit()
+        self.statements.clear()
+        send_digests(batch_size=1)
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_notifications_recipient')
+
+    def test_post_archive(self):
+        Post.archive(datetime(2020, 1, 1, 0, 10), batch_size=4)
+        self.client.get('/auth/user/john?archived=1')
+        self.client.get('/auth/user/susan')
+        self.assertIndexedPlans()
+        self.assertUsesIndex('ix_posts_time')
+        self.assertUsesIndex('ix_posts_archive_author_time')
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from flask import session
+
+from app import create_app, db, replica
+from app.models import User, Post, Role, ReplicaHeartbeat
+from app.replica import LAST_WRITE_KEY
+
+
+class ReplicaTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        fd, self.replica_path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite:///' + self.replica_path}
+        self.app.config['SOCIAL_BLOG_REPLICA_CHECK_INTERVAL'] = 0
+        self.app.config['SOCIAL_BLOG_REPLICA_MAX_LAG'] = 60
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        self.john = User(email='john@example.com', username='john')
+        db.session.add(self.john)
+        db.session.commit()
+        self.now = datetime.utcnow()
+        self.post('replicated', self.now)
+        replica.beat(self.app)
+        self.replicate()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite:///' + self.replica_path}
+        db.get_engine(self.app, bind='replica').dispose()
+        self.app_context.pop()
+        os.remove(self.replica_path)
+
+    def post(self, body, time):
+        db.session.add(Post(body=body, author=self.john, time=time))
+        db.session.commit()
+
+    def replicate(self):
+        source = sqlite3.connect(db.engine.url.database)
+        target = sqlite3.connect(self.replica_path)
+        source.backup(target)
+        target.close()
+        source.close()
+
+    def count(self, method='GET'):
+        db.session.remove()
+        with self.app.test_request_context('/', method=method):
+            return Post.query.count()
+
+    def test_get_reads_from_replica(self):
+        self.post('primary only', self.now + timedelta(seconds=1))
+        self.assertEqual(self.count('GET'), 1)
+        self.assertEqual(self.count('POST'), 2)
+
+    def test_reads_after_write_use_primary(self):
+        self.post('primary only', self.now + timedelta(seconds=1))
+        john_id = self.john.id
+        db.session.remove()
+        with self.app.test_request_context('/'):
+            self.assertEqual(Post.query.count(), 1)
+            db.session.add(Post(body='new', author_id=john_id, time=self.now))
+            db.session.flush()
+            self.assertEqual(Post.query.count(), 3)
+            db.session.rollback()
+
+    def test_recent_write_in_session_uses_primary(self):
+        self.post('primary only', self.now + timedelta(seconds=1))
+        db.session.remove()
+        with self.app.test_request_context('/'):
+            session[LAST_WRITE_KEY] = time.time()
+            self.assertEqual(Post.query.count(), 2)
+
+    def heartbeat(self, bind=None):
+        with db.get_engine(self.app, bind=bind).connect() as connection:
+            return ReplicaHeartbeat.read(connection)
+
+    def test_caught_up_replica_has_no_lag(self):
+        self.assertLess(replica.lag(), 1)
+
+    def test_short_lag_is_measured(self):
+        self.app.config['SOCIAL_BLOG_REPLICA_MAX_LAG'] = 5
+        self.post('primary only', self.now + timedelta(seconds=1))
+        with db.get_engine(self.app, bind='replica').begin() as connection:
+            ReplicaHeartbeat.beat(connection, datetime.utcnow() - timedelta(seconds=7))
+        self.assertGreater(replica.lag(), 5)
+        self.assertEqual(self.count('GET'), 2)
+
+    def test_check_interval_must_be_shorter_than_max_lag(self):
+        app = create_app('testing')
+        app.config['SOCIAL_BLOG_REPLICA_CHECK_INTERVAL'] = 10
+        with self.assertRaises(ValueError):
+            replica.init_app(app)
+
+    def test_lagging_replica_is_bypassed(self):
+        self.post('primary only', self.now + timedelta(seconds=1))
+        with db.get_engine(self.app, bind='replica').begin() as connection:
+            ReplicaHeartbeat.beat(connection, self.now - timedelta(minutes=5))
+        replica.beat(self.app)
+        self.assertGreater(replica.lag(), 60)
+        self.assertEqual(self.count('GET'), 2)
+
+    def test_lag_does_not_depend_on_posting(self):
+        with db.get_engine(self.app, bind='replica').begin() as connection:
+            ReplicaHeartbeat.beat(connection, self.now - timedelta(minutes=5))
+        replica.beat(self.app)
+        self.assertGreater(replica.lag(), 60)
+
+    def test_health_check_stamps_primary_heartbeat(self):
+        before = self.heartbeat()
+        self.count('GET')
+        self.assertGreater(self.heartbeat(), before)
+        self.assertEqual(self.heartbeat('replica'), before)
+
+    def test_unavailable_replica_is_bypassed(self):
+        db.get_engine(self.app, bind='replica').execute('DROP TABLE replica_heartbeat')
+        self.post('primary only', self.now + timedelta(seconds=1))
+        self.assertEqual(self.count('GET'), 2)
+
+    def test_without_replica_bind(self):
+        self.app.config['SQLALCHEMY_BINDS'] = None
+        self.post('primary only', self.now + timedelta(seconds=1))
+        self.assertEqual(self.count('GET'), 2)
@@ -0,0 +1,73 @@
+import unittest
+
+from app import create_app, db, search
+from app.models import Post, User
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.author = User(email='john@example.com', username='john')
+        db.session.add_all([
+            Post(body='flask makes web apps simple', author=self.author),
+            Post(body='sqlite full text search with fts5', author=self.author),
+            Post(body='flask and sqlite, flask and sqlite', author=self.author),
+        ])
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def bodies(self, terms, **kwargs):
+        posts, _ = Post.search(terms, **kwargs)
+        return [post.body for post in posts]
+
+    def test_ranked_matches(self):
+        self.assertEqual(self.bodies('flask sqlite'), ['flask and sqlite, flask and sqlite'])
+        self.assertEqual(self.bodies('flask')[0], 'flask and sqlite, flask and sqlite')
+        self.assertEqual(self.bodies('"unbalanced'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.query.filter(Post.body.like('%fts5%')).first()
+        post.body = 'rewritten about postgres'
+        db.session.commit()
+        self.assertEqual(self.bodies('fts5'), [])
+        self.assertEqual(self.bodies('postgres'), ['rewritten about postgres'])
+        db.session.delete(post)
+        db.session.commit()
+        self.assertEqual(self.bodies('postgres'), [])
+
+    def test_pagination(self):
+        posts, has_next = Post.search('flask', per_page=1)
+        self.assertTrue(has_next)
+        posts, has_next = Post.search('flask', page=2, per_page=1)
+        self.assertFalse(has_next)
+        self.assertEqual(len(posts), 1)
+
+    def test_disabled_posts_are_hidden(self):
+        post = Post.query.filter(Post.body.like('%fts5%')).first()
+        post.disabled = True
+        db.session.commit()
+        self.assertEqual(self.bodies('fts5'), [])
+        self.assertEqual(self.bodies('fts5', include_disabled=True),
+                         ['sqlite full text search with fts5'])
+        posts, has_next = Post.search('sqlite', per_page=1)
+        self.assertEqual([post.body for post in posts], ['flask and sqlite, flask and sqlite'])
+        self.assertFalse(has_next)
+
+    def test_rebuild_index(self):
+        db.session.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('delete-all')")
+        db.session.commit()
+        self.assertEqual(self.bodies('flask'), [])
+        self.assertEqual(search.rebuild_index(batch_size=2), 3)
+        self.assertEqual(len(self.bodies('flask')), 2)
+
+    def test_search_view(self):
+        response = self.app.test_client().get('/search?q=fts5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'fts5', response.data)
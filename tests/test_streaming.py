@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, last_seen
+from app.models import User, Post, Role
+
+
+class StreamingTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app.config['SOCIAL_BLOG_STREAM_YIELD_PER'] = 10
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_role()
+        john = User(email='john@example.com', username='john')
+        db.session.add(john)
+        db.session.add_all([Post(body=f'post number {i}', author=john,
+                                 time=datetime(2020, 1, 1) + timedelta(minutes=i))
+                            for i in range(60)])
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        last_seen.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_user_page_is_streamed(self):
+        response = self.client.get('/auth/user/john', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertIn('ETag', response.headers)
+        chunks = list(response.response)
+        response.close()
+        self.assertGreater(len(chunks), 2)
+        self.assertIn(b'<title>Social Blog - john</title>', chunks[0])
+        body = b''.join(chunks).decode('utf-8')
+        self.assertLess(body.index('post number 59'), body.index('post number 0<'))
+        self.assertEqual(body.count('class="post"'), 60)
+
+    def test_streamed_page_matches_rendered_page(self):
+        streamed = self.client.get('/auth/user/john').data
+        self.app.config['SOCIAL_BLOG_STREAM_PAGES'] = False
+        response = self.client.get('/auth/user/john')
+        self.assertIn('Content-Length', response.headers)
+        self.assertEqual(response.data, streamed)
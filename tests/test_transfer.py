@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app, db, fake, transfer
+from app.models import User, Post, Role, ArchivedPost
+
+
+class TransferTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        fake.seed(users=10, posts=50, follows=0, random_seed=3)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def snapshot(self):
+        return ([(u.id, u.email, u.avatar_hash, u.posts_count, u.member_since)
+                 for u in User.query.order_by(User.id)],
+                [(p.id, p.body, p.body_html, p.time, p.author_id)
+                 for p in Post.query.order_by(Post.id)])
+
+    def reset(self):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+    def roundtrip(self, fmt):
+        before = self.snapshot()
+        counts = transfer.export_data(self.directory, fmt, batch_size=7)
+        self.assertEqual(counts, {'roles': 3, 'users': 10, 'posts': 50, 'posts_archive': 0})
+        self.reset()
+        transfer.import_data(self.directory, fmt, batch_size=7)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(Role.query.count(), 3)
+
+    def test_ndjson_roundtrip(self):
+        self.roundtrip('ndjson')
+
+    def test_csv_roundtrip(self):
+        self.roundtrip('csv')
+
+    def test_resume_from_checkpoint(self):
+        before = self.snapshot()
+        transfer.export_data(self.directory, batch_size=7)
+        self.reset()
+        with open(transfer._path(self.directory, Post.__table__, 'ndjson')) as f:
+            first = [json.loads(line) for line in f][:20]
+        transfer.import_data(self.directory, batch_size=7)
+        Post.query.filter(Post.id > first[-1]['id']).delete()
+        db.session.commit()
+        with open(os.path.join(self.directory, transfer.CHECKPOINT), 'w') as f:
+            json.dump({'roles': 3, 'users': 10, 'posts': 14}, f)
+        transfer.import_data(self.directory, batch_size=7)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, transfer.CHECKPOINT)))
+
+    def test_replayed_rows_are_skipped_without_dialect_upserts(self):
+        before = self.snapshot()
+        transfer.export_data(self.directory, batch_size=7)
+        self.reset()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            transfer.import_data(self.directory, batch_size=7)
+            transfer.import_data(self.directory, batch_size=7, resume=False)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(self.snapshot(), before)
+        for table in ('roles', 'users', 'posts'):
+            self.assertNotIn(f'INSERT OR IGNORE INTO {table} ', '\n'.join(statements))
+
+    def test_archived_ids_are_not_reused_after_import(self):
+        Post.archive(datetime.utcnow() + timedelta(days=1))
+        transfer.export_data(self.directory)
+        self.reset()
+        transfer.import_data(self.directory)
+        self.assertEqual(Post.query.count(), 0)
+        post = Post(body='new', author=User.query.first())
+        db.session.add(post)
+        db.session.commit()
+        self.assertGreater(post.id, db.session.query(db.func.max(ArchivedPost.id)).scalar())
+
+    def test_missing_columns_take_defaults_but_nulls_stay(self):
+        user = User.query.first()
+        user.confirmed = None
+        db.session.commit()
+        user_id = user.id
+        transfer.export_data(self.directory)
+        path = transfer._path(self.directory, Post.__table__, 'ndjson')
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        with open(path, 'w') as f:
+            for record in records:
+                del record['version']
+                f.write(json.dumps(record) + '\n')
+        self.reset()
+        transfer.import_data(self.directory)
+        self.assertIsNone(User.query.get(user_id).confirmed)
+        self.assertEqual({post.version for post in Post.query}, {0})
+
+    def test_postgresql_sequences_are_reset(self):
+        statement = str(transfer._sequence_reset(User.__table__))
+        self.assertIn("setval(pg_get_serial_sequence('users', 'id')", statement)
@@ -1,7 +1,7 @@
 import unittest
 import time
 
-from app import create_app, db
+from app import create_app, db, password_hasher
 from app.models import User, AnonymousUser, Role, Permissions
 
 
@@ -36,6 +36,25 @@ class UserTestCase(unittest.TestCase):
         user2 = User(password='beer')
         self.assertTrue(user1.password_hash != user2.password_hash)
 
+    def test_password_rehash(self):
+        u = User(password='cat')
+        self.assertFalse(u.password_needs_rehash())
+        self.app.config['SOCIAL_BLOG_PASSWORD_METHOD'] = 'pbkdf2:sha256:200000'
+        self.assertTrue(u.password_needs_rehash())
+        self.assertTrue(u.verify_password('cat'))
+        u.password = 'cat'
+        self.assertTrue(u.password_hash.startswith('pbkdf2:sha256:200000$'))
+        self.assertFalse(u.password_needs_rehash())
+
+    def test_password_process_pool(self):
+        self.app.config['SOCIAL_BLOG_HASH_WORKERS'] = 1
+        try:
+            u = User(password='cat')
+            self.assertTrue(u.verify_password('cat'))
+            self.assertFalse(u.verify_password('dog'))
+        finally:
+            password_hasher.shutdown(self.app)
+
     def test_valid_confirm_token(self):
         u = User(password='ale')
         db.session.add(u)